@@ -0,0 +1,168 @@
+"""
+Vectorised scoring for group quizzes
+- AnswerMatrix keeps every answer as an int8 choice code in a users x questions array,
+  filled by poll_answer (-1 = not answered)
+- score() computes correct/wrong counts, penalties, adjusted scores, ranking,
+  percentiles and per-question option distributions in one NumPy pass
+- summarize_scores() gives the max/min/mean/median/percentile figures used by the
+  result reports, with a pure Python fallback when NumPy is not installed
+"""
+
+import logging
+
+from startup import lazy_import, module_available
+
+# NumPy is imported by the first group quiz that needs it, not at bot startup
+NUMPY_AVAILABLE = module_available("numpy")
+np = lazy_import("numpy") if NUMPY_AVAILABLE else None
+
+logger = logging.getLogger(__name__)
+
+UNANSWERED = -1
+
+# Telegram polls have at most 10 options
+MAX_OPTIONS = 10
+
+INITIAL_ROWS = 64
+
+
+class AnswerMatrix:
+    """Choice codes of every participant for every question of one quiz"""
+
+    def __init__(self, answer_key, question_penalties):
+        self.answer_key = np.asarray(answer_key, dtype=np.int8)
+        self.penalties = np.asarray(question_penalties, dtype=np.float32)
+        self.choices = np.full((INITIAL_ROWS, len(self.answer_key)), UNANSWERED, dtype=np.int8)
+        self.rows = {}       # user_id -> row
+        self.user_ids = []
+        self.names = []
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @property
+    def question_count(self):
+        return len(self.answer_key)
+
+    def add_user(self, user_id, name):
+        """Row of a participant, appending one (and doubling capacity) if needed"""
+        user_id = str(user_id)
+        row = self.rows.get(user_id)
+        if row is not None:
+            return row
+        row = len(self.user_ids)
+        if row >= self.choices.shape[0]:
+            grown = np.full((self.choices.shape[0] * 2, self.question_count), UNANSWERED, dtype=np.int8)
+            grown[:row] = self.choices
+            self.choices = grown
+        self.rows[user_id] = row
+        self.user_ids.append(user_id)
+        self.names.append(name)
+        return row
+
+    def record(self, user_id, name, question_index, option_id):
+        """Store a user's first answer to a question; returns False for repeats or bad indexes"""
+        if not 0 <= question_index < self.question_count or option_id is None:
+            return False
+        if not 0 <= option_id < MAX_OPTIONS:
+            return False
+        row = self.add_user(user_id, name)
+        if self.choices[row, question_index] != UNANSWERED:
+            return False
+        self.choices[row, question_index] = option_id
+        return True
+
+    def score(self):
+        """
+        Score every participant in one pass.
+        Returns a dict of arrays in ranking order (adjusted score, then correct
+        answers, both descending; ties keep arrival order), plus the per-question
+        option distribution as an options x questions count matrix.
+        """
+        n = len(self.user_ids)
+        choices = self.choices[:n]
+        answered = choices != UNANSWERED
+        correct = answered & (choices == self.answer_key)
+        wrong = answered & ~correct
+
+        correct_counts = correct.sum(axis=1, dtype=np.int32)
+        wrong_counts = wrong.sum(axis=1, dtype=np.int32)
+        answered_counts = answered.sum(axis=1, dtype=np.int32)
+        penalties = wrong.astype(np.float32) @ self.penalties
+        adjusted = np.maximum(0.0, correct_counts - penalties)
+
+        # lexsort is stable and sorts by the last key first
+        order = np.lexsort((-correct_counts, -adjusted))
+        # Percentile rank: share of participants scoring below, counting ties as half
+        sorted_adjusted = np.sort(adjusted)
+        below = np.searchsorted(sorted_adjusted, adjusted, side="left")
+        at_or_below = np.searchsorted(sorted_adjusted, adjusted, side="right")
+        percentiles = (below + at_or_below) / 2 / max(n, 1) * 100
+
+        option_counts = np.stack([(choices == option).sum(axis=0) for option in range(MAX_OPTIONS)])
+
+        return {
+            "order": order,
+            "correct": correct_counts[order],
+            "wrong": wrong_counts[order],
+            "answered": answered_counts[order],
+            "penalty": penalties[order],
+            "adjusted": adjusted[order],
+            "percentile": percentiles[order],
+            "user_ids": [self.user_ids[i] for i in order],
+            "names": [self.names[i] for i in order],
+            "option_counts": option_counts,
+            "question_attempts": answered.sum(axis=0),
+            "question_correct": correct.sum(axis=0),
+        }
+
+    def final_scores(self, neg_value=None):
+        """Ranked participant dicts in the shape end_quiz builds its results from"""
+        result = self.score()
+        return [
+            {
+                "user_id": user_id,
+                "name": name,
+                "correct": int(correct),
+                "wrong": int(wrong),
+                "participation": int(answered),
+                "penalty": round(float(penalty), 4),
+                "adjusted_score": round(float(adjusted), 4),
+                "percentile": round(float(percentile), 1),
+                "neg_value": neg_value,
+            }
+            for user_id, name, correct, wrong, answered, penalty, adjusted, percentile in zip(
+                result["user_ids"], result["names"], result["correct"], result["wrong"],
+                result["answered"], result["penalty"], result["adjusted"], result["percentile"],
+            )
+        ]
+
+
+def summarize_scores(scores):
+    """Max, min, mean, median and quartiles of a list of scores"""
+    if not scores:
+        return None
+    if NUMPY_AVAILABLE:
+        values = np.asarray(scores, dtype=np.float64)
+        p25, median, p75, p90 = np.percentile(values, [25, 50, 75, 90])
+        return {
+            "max": float(values.max()), "min": float(values.min()), "mean": float(values.mean()),
+            "median": float(median), "p25": float(p25), "p75": float(p75), "p90": float(p90),
+            "above_mean": int((values > values.mean()).sum()),
+        }
+
+    values = sorted(float(score) for score in scores)
+    mean = sum(values) / len(values)
+
+    def percentile(q):
+        # Linear interpolation, matching numpy.percentile's default
+        position = (len(values) - 1) * q / 100
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    return {
+        "max": values[-1], "min": values[0], "mean": mean,
+        "median": percentile(50), "p25": percentile(25), "p75": percentile(75), "p90": percentile(90),
+        "above_mean": sum(1 for value in values if value > mean),
+    }
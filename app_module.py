@@ -4,7 +4,9 @@ This is imported by gunicorn and wsgi entry points
 """
 import os
 import logging
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+
+from health import proxy_health
 
 # Configure logging
 logging.basicConfig(
@@ -26,8 +28,9 @@ def index():
     })
 
 @app.route('/health')
+@app.route('/health/live')
+@app.route('/health/ready')
 def health():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "healthy"
-    })
\ No newline at end of file
+    """Health check endpoint: relays the bot process's own /health, /health/live or /health/ready"""
+    status, body = proxy_health(request.path)
+    return jsonify(body), status
\ No newline at end of file
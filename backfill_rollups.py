@@ -0,0 +1,74 @@
+"""
+Backfill tool for the time-bucketed statistics rollups
+- Reads every recorded attempt from quiz_results.json
+- Computes daily, weekly, monthly and yearly rollups per user and per quiz
+- Replaces the stats_rollups collection with the computed buckets (built
+  aside, then renamed over it)
+
+Usage:
+    python backfill_rollups.py [--results quiz_results.json] [--dry-run]
+
+Run it once after deploying rollups, or whenever the collection needs to be
+rebuilt from the results file. The rebuild replaces existing buckets, so it
+is safe to run again.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING
+)
+logger = logging.getLogger("backfill_rollups")
+
+
+def run(args):
+    import simple_bot
+    from stats_rollups import aggregate_results, rebuild_rollups
+
+    results_file = args.results or simple_bot.QUIZ_RESULTS_FILE
+    if not os.path.exists(results_file):
+        print(f"Results file not found: {results_file}")
+        return 1
+
+    started = time.monotonic()
+    with open(results_file, 'r') as f:
+        quiz_results = json.load(f)
+    attempts = sum(len(q.get("participants", [])) for q in quiz_results.values() if isinstance(q, dict))
+    print(f"Read {attempts} attempts across {len(quiz_results)} quizzes from {results_file}")
+
+    if args.dry_run:
+        rollups, skipped = aggregate_results(quiz_results)
+        by_scope = {}
+        for doc in rollups.values():
+            key = f"{doc['scope']}/{doc['period']}"
+            by_scope[key] = by_scope.get(key, 0) + 1
+        for key, count in sorted(by_scope.items()):
+            print(f"  {key:<16} {count} buckets")
+        print(f"Dry run: {len(rollups)} buckets computed, {skipped} attempts skipped")
+        return 0
+
+    if not simple_bot.init_mongodb() or simple_bot.rollup_collection is None:
+        print("MongoDB unavailable, nothing written.")
+        return 1
+
+    written, skipped = rebuild_rollups(simple_bot.rollup_collection, quiz_results, batch_size=args.batch_size)
+    print(f"Wrote {written} rollup buckets ({skipped} attempts skipped) "
+          f"in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild statistics rollups from quiz_results.json")
+    parser.add_argument("--results", help="Path to the quiz results file (default: the bot's quiz_results.json)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Buckets per MongoDB bulk_write")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and summarise buckets without writing")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Offline bulk loader for the Telegram Quiz Bot question bank
+- Reads directories of TXT, PDF and JSON question files in parallel
+- Validates questions with the same rules as add_questions_with_id
+- Drops duplicates using the shared near-duplicate index, and indexes each
+  batch once it is saved
+- Writes to questions.json once per batch and to MongoDB with bulk_write
+- Prints throughput and a rejection report
+
+Usage:
+    python bulk_loader.py DIR [DIR ...] [--quiz-id ID] [--workers N]
+                          [--batch-size N] [--no-mongo] [--dry-run]
+                          [--keep-duplicates] [--report report.json]
+
+Each file becomes its own quiz (ID = file name without extension) unless
+--quiz-id is given. JSON files may contain either a list of questions or the
+{quiz_id: [questions]} structure used by questions.json.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING
+)
+logger = logging.getLogger("bulk_loader")
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf", ".json")
+
+# Questions per MongoDB bulk_write / questions.json flush
+DEFAULT_BATCH_SIZE = 5000
+
+
+def find_input_files(paths):
+    """Collect supported files from the given files and directories"""
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            if path.lower().endswith(SUPPORTED_EXTENSIONS):
+                files.append(path)
+            continue
+        for root, _, names in os.walk(path):
+            for name in sorted(names):
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    files.append(os.path.join(root, name))
+    return files
+
+
+def quiz_id_for_file(file_path):
+    """Derive a quiz ID from a file name"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return re.sub(r'[^\w\-]+', '_', stem).strip('_') or "bulk"
+
+
+def _read_text_file(file_path):
+    """Read a text file, falling back through the encodings /txtimport accepts"""
+    for encoding in ('utf-8', 'utf-16'):
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                return f.read()
+        except UnicodeDecodeError:
+            continue
+    with open(file_path, 'r', encoding='latin-1') as f:
+        return f.read()
+
+
+def parse_file(file_path):
+    """
+    Parse one input file in a worker process.
+    Returns (file_path, {quiz_id: [questions]}, error)
+    """
+    try:
+        # Imported here so each worker process loads the parsers once
+        import simple_bot
+
+        quiz_id = quiz_id_for_file(file_path)
+        lower = file_path.lower()
+
+        if lower.endswith(".txt"):
+            lines = _read_text_file(file_path).splitlines()
+            return file_path, {quiz_id: simple_bot.extract_questions_from_txt(lines)}, None
+
+        if lower.endswith(".pdf"):
+            lines = simple_bot.group_and_deduplicate_questions(simple_bot.extract_text_from_pdf(file_path))
+            return file_path, {quiz_id: simple_bot.parse_questions_from_text(lines, quiz_id)}, None
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return file_path, {quiz_id: data}, None
+        if isinstance(data, dict):
+            return file_path, {str(k): v if isinstance(v, list) else [v] for k, v in data.items()}, None
+        return file_path, {}, "unsupported JSON structure"
+    except Exception as e:
+        return file_path, {}, str(e)
+
+
+class BulkLoadReport:
+    """Counters and rejection details for one loader run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.files = 0
+        self.failed_files = {}
+        self.parsed = 0
+        self.accepted = 0
+        self.rejections = {}
+        self.rejected_samples = []
+        self.duplicates = 0
+        self.flagged = 0
+        self.quizzes = set()
+
+    def reject(self, file_path, question, reason):
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        if len(self.rejected_samples) < 50:
+            text = question.get("question", "") if isinstance(question, dict) else question
+            self.rejected_samples.append({"file": file_path, "reason": reason, "question": str(text)[:120]})
+
+    def as_dict(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "files": self.files,
+            "failed_files": self.failed_files,
+            "quizzes": len(self.quizzes),
+            "parsed_questions": self.parsed,
+            "accepted_questions": self.accepted,
+            "duplicates_dropped": self.duplicates,
+            "duplicates_flagged": self.flagged,
+            "rejections": self.rejections,
+            "rejected_samples": self.rejected_samples,
+            "elapsed_seconds": round(elapsed, 2),
+            "files_per_second": round(self.files / elapsed, 2),
+            "questions_per_second": round(self.accepted / elapsed, 2),
+        }
+
+    def print_summary(self):
+        data = self.as_dict()
+        print("\n=== Bulk load report ===")
+        print(f"Files processed:      {data['files']} ({len(data['failed_files'])} failed)")
+        print(f"Quizzes touched:      {data['quizzes']}")
+        print(f"Questions parsed:     {data['parsed_questions']}")
+        print(f"Questions accepted:   {data['accepted_questions']}")
+        print(f"Duplicates dropped:   {data['duplicates_dropped']}")
+        print(f"Duplicates flagged:   {data['duplicates_flagged']}")
+        print(f"Elapsed:              {data['elapsed_seconds']}s")
+        print(f"Throughput:           {data['files_per_second']} files/s, "
+              f"{data['questions_per_second']} questions/s")
+        if data["rejections"]:
+            print("Rejections by reason:")
+            for reason, count in sorted(data["rejections"].items(), key=lambda item: -item[1]):
+                print(f"  {count:>7}  {reason}")
+        for file_path, error in data["failed_files"].items():
+            print(f"  FAILED {file_path}: {error}")
+
+
+def load_local_questions(questions_file):
+    """Read questions.json directly (MongoDB is merged in by the bot at runtime)"""
+    if not os.path.exists(questions_file):
+        return {}
+    with open(questions_file, 'r') as f:
+        return json.load(f)
+
+
+def flush_to_mongodb(collection, pending, creator_id, creator_name):
+    """Append pending questions to their quiz documents with one bulk_write"""
+    from pymongo import UpdateOne
+
+    now = datetime.datetime.now().isoformat()
+    operations = [
+        UpdateOne(
+            {"quiz_id": quiz_id},
+            {
+                "$push": {"questions": {"$each": questions}},
+                "$set": {"timestamp": now},
+                "$setOnInsert": {
+                    "quiz_id": quiz_id,
+                    "title": f"Quiz {quiz_id}",
+                    "type": "free",
+                    "creator_id": str(creator_id) if creator_id else None,
+                    "creator_name": creator_name,
+                    "created_at": now,
+                },
+            },
+            upsert=True,
+        )
+        for quiz_id, questions in pending.items()
+        if questions
+    ]
+    if not operations:
+        return
+    result = collection.bulk_write(operations, ordered=False)
+    logger.info(f"MongoDB bulk_write: {result.upserted_count} new quizzes, {result.modified_count} updated")
+
+
+def run(args):
+    import simple_bot
+    from question_dedup import QuestionDedupIndex, filter_duplicate_questions, record_questions
+
+    files = find_input_files(args.paths)
+    if not files:
+        print("No TXT, PDF or JSON files found.")
+        return 1
+    print(f"Loading {len(files)} files with {args.workers} workers...")
+
+    report = BulkLoadReport()
+    all_questions = load_local_questions(simple_bot.QUESTIONS_FILE)
+
+    collection = None
+    if not args.no_mongo and not args.dry_run:
+        if simple_bot.init_mongodb():
+            collection = simple_bot.quiz_collection
+        else:
+            print("MongoDB unavailable, writing to the JSON store only.")
+
+    # A dry run checks against a private index built from the bank, so the shared one is left untouched
+    dedup_index = None
+    if args.dry_run and not args.keep_duplicates:
+        dedup_index = QuestionDedupIndex.from_questions(all_questions)
+    # Questions accepted since the last flush; they join the shared index once saved
+    staged = QuestionDedupIndex()
+
+    pending = {}
+    pending_count = 0
+
+    def flush():
+        nonlocal pending, pending_count, staged
+        if not pending or args.dry_run:
+            pending, pending_count = {}, 0
+            return
+        # Bots may have saved the bank since it was read; merge into a fresh copy under their lock
+        with simple_bot.file_lock(simple_bot.QUESTIONS_FILE):
+            stored = load_local_questions(simple_bot.QUESTIONS_FILE)
+            for quiz_id, questions in pending.items():
+                existing = stored.get(quiz_id, [])
+                if not isinstance(existing, list):
+                    existing = [existing]
+                stored[quiz_id] = existing + questions
+            if simple_bot.save_questions(stored) and not args.keep_duplicates:
+                # Appended to the shared fingerprint journal, so running bots see them too
+                for quiz_id, questions in pending.items():
+                    record_questions(quiz_id, questions, lambda: stored)
+        staged = QuestionDedupIndex()
+        if collection is not None:
+            try:
+                flush_to_mongodb(collection, pending, args.creator_id, args.creator_name)
+            except Exception as e:
+                logger.error(f"MongoDB bulk_write failed: {e}")
+                report.failed_files["<mongodb>"] = str(e)
+        pending, pending_count = {}, 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(parse_file, file_path) for file_path in files]
+        for future in as_completed(futures):
+            file_path, parsed, error = future.result()
+            report.files += 1
+            if error:
+                report.failed_files[file_path] = error
+                continue
+
+            for quiz_id, questions in parsed.items():
+                quiz_id = str(args.quiz_id or quiz_id).strip()
+                report.parsed += len(questions)
+
+                try:
+                    valid, rejected = simple_bot.validate_questions(
+                        quiz_id, questions, args.creator_id, args.creator_name
+                    )
+                except Exception as e:
+                    # Malformed input (e.g. a question that is not a dict) rejects this quiz, not the run
+                    logger.warning(f"Validation failed for quiz {quiz_id} in {file_path}: {e}")
+                    valid, rejected = [], [(question, f"invalid quiz ({type(e).__name__})") for question in questions]
+                for question, reason in rejected:
+                    report.reject(file_path, question, reason)
+
+                if not args.keep_duplicates:
+                    valid, dropped, flagged = filter_duplicate_questions(
+                        quiz_id, valid, lambda: all_questions, index=dedup_index, staged=staged
+                    )
+                    report.duplicates += len(dropped)
+                    report.flagged += len(flagged)
+                    for question in dropped:
+                        report.reject(file_path, question, "duplicate")
+
+                if not valid:
+                    continue
+
+                existing = all_questions.get(quiz_id, [])
+                if not isinstance(existing, list):
+                    existing = [existing]
+                existing.extend(valid)
+                all_questions[quiz_id] = existing
+                pending.setdefault(quiz_id, []).extend(valid)
+                pending_count += len(valid)
+                report.accepted += len(valid)
+                report.quizzes.add(quiz_id)
+
+            if pending_count >= args.batch_size:
+                flush()
+
+            if report.files % 100 == 0:
+                print(f"  {report.files}/{len(files)} files, {report.accepted} questions accepted")
+
+    flush()
+
+    report.print_summary()
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report.as_dict(), f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.report}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load question files into the quiz bot storage")
+    parser.add_argument("paths", nargs="+", help="Files or directories with .txt, .pdf or .json questions")
+    parser.add_argument("--quiz-id", help="Store every question under this quiz ID instead of one quiz per file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel parser processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Questions per storage flush")
+    parser.add_argument("--creator-id", help="Creator user ID to stamp on imported questions")
+    parser.add_argument("--creator-name", help="Creator name to stamp on imported questions")
+    parser.add_argument("--no-mongo", action="store_true", help="Only write to the JSON store")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate without writing anything")
+    parser.add_argument("--keep-duplicates", action="store_true", help="Skip near-duplicate detection")
+    parser.add_argument("--report", help="Write the full report as JSON to this path")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
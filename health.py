@@ -0,0 +1,157 @@
+"""
+Liveness and readiness of the bot process
+- CircuitBreaker: after repeated MongoDB connect/ping failures, stop trying
+  (and blocking handlers on the 5 s timeout) until a cool-down has passed
+- evaluate() turns runtime signals into liveness and readiness verdicts:
+  live = the event loop is turning and updates are still being fetched;
+  ready = live, started, and not overloaded (loop lag, update backlog)
+- GET /health (full report), /health/live and /health/ready are served by the
+  bot process itself (webhook server, or the METRICS_PORT server when polling)
+- proxy_health() lets the separate Flask/HTTP health servers relay the bot's
+  answer instead of a static "healthy"; an unreachable bot is unhealthy
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Port of the bot's own health/metrics server when it runs next to a web front end
+DEFAULT_BOT_HEALTH_PORT = 8081
+
+# Liveness: loop heartbeat and, in polling mode, the last successful getUpdates
+DEFAULT_MAX_LOOP_STALL_SECONDS = 30.0
+DEFAULT_MAX_FETCH_AGE_SECONDS = 120.0
+
+# Readiness: recent loop lag and updates waiting to be processed
+DEFAULT_MAX_READY_LOOP_LAG_SECONDS = 1.0
+DEFAULT_MAX_READY_BACKLOG = 256
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Closed until failure_threshold consecutive failures, then open for
+    reset_timeout seconds; after that one trial call is let through (half open).
+    """
+
+    def __init__(self, failure_threshold=2, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_success_at = None
+        self.last_failure_at = None
+        self.last_error = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go ahead now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+            self.last_success_at = time.time()
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            self.last_failure_at = time.time()
+            self.last_error = str(error) if error is not None else None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+            "last_error": self.last_error,
+        }
+
+
+def evaluate(signals, max_loop_stall=DEFAULT_MAX_LOOP_STALL_SECONDS, max_fetch_age=DEFAULT_MAX_FETCH_AGE_SECONDS,
+             max_loop_lag=DEFAULT_MAX_READY_LOOP_LAG_SECONDS, max_backlog=DEFAULT_MAX_READY_BACKLOG):
+    """
+    (live, ready, reasons) from a dict of signals:
+    started, running, loop_heartbeat_age, fetch_age (None outside polling mode),
+    recent_loop_lag, backlog
+    """
+    reasons = []
+    live = True
+    if signals.get("started") and not signals.get("running"):
+        live = False
+        reasons.append("update processing stopped")
+    heartbeat_age = signals.get("loop_heartbeat_age")
+    if heartbeat_age is not None and heartbeat_age > max_loop_stall:
+        live = False
+        reasons.append(f"event loop stalled for {heartbeat_age:.0f}s")
+    fetch_age = signals.get("fetch_age")
+    if signals.get("started") and fetch_age is not None and fetch_age > max_fetch_age:
+        live = False
+        reasons.append(f"no successful getUpdates for {fetch_age:.0f}s")
+
+    ready = live
+    if not signals.get("started"):
+        ready = False
+        reasons.append("starting")
+    lag = signals.get("recent_loop_lag") or 0.0
+    if lag > max_loop_lag:
+        ready = False
+        reasons.append(f"overloaded: loop lag {lag * 1000:.0f} ms")
+    backlog = signals.get("backlog") or 0
+    if backlog > max_backlog:
+        ready = False
+        reasons.append(f"overloaded: {backlog} updates waiting")
+    return live, ready, reasons
+
+
+def response(report, check):
+    """(status, content type, body) for /health (check="live"), /health/live or /health/ready"""
+    ok = report["ready"] if check == "ready" else report["live"]
+    return (200 if ok else 503), "application/json", json.dumps(report, default=str)
+
+
+def bot_health_url(path="/health"):
+    """URL of the bot process's health endpoint (BOT_HEALTH_URL, else localhost:METRICS_PORT)"""
+    base = os.environ.get("BOT_HEALTH_URL", "")
+    if not base:
+        port = os.environ.get("METRICS_PORT") or str(DEFAULT_BOT_HEALTH_PORT)
+        base = f"http://127.0.0.1:{port}"
+    return base.rstrip("/") + path
+
+
+def proxy_health(path="/health", timeout=2.0):
+    """(status, body dict) from the bot process; 503 if it cannot be reached"""
+    url = bot_health_url(path)
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as reply:
+            return reply.status, json.loads(reply.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"{}")
+        except ValueError:
+            return e.code, {"status": "unhealthy"}
+    except (OSError, ValueError) as e:
+        return 503, {"status": "unreachable", "url": url, "error": str(e)}
@@ -1,12 +1,16 @@
 """
 Health check for the Telegram Quiz Bot
-This creates a simple HTTP endpoint for Koyeb to check the health of the service
+This creates a simple HTTP endpoint for Koyeb to check the health of the service,
+answered by the bot process itself (see health.py)
 """
 import os
+import json
 import logging
 import http.server
 from http.server import BaseHTTPRequestHandler
 
+from health import proxy_health
+
 # Configure logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -18,12 +22,13 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
     """Health check HTTP request handler"""
     def do_GET(self):
         """Handle GET requests"""
-        if self.path == '/health':
-            # Return 200 OK for health checks
-            self.send_response(200)
+        if self.path in ('/health', '/health/live', '/health/ready'):
+            # Relay the bot process's own verdict (503 if the bot cannot be reached)
+            status, body = proxy_health(self.path)
+            self.send_response(status)
             self.send_header('Content-type', 'application/json')
             self.end_headers()
-            self.wfile.write(b'{"status": "healthy"}')
+            self.wfile.write(json.dumps(body).encode())
         elif self.path == '/':
             # Return a simple homepage
             self.send_response(200)
@@ -0,0 +1,466 @@
+"""
+Incrementally maintained leaderboards
+- IndexedSkipList: ordered keys with O(log n) expected insert, remove, rank and index lookup
+- Leaderboard: one entry per member (best score), answering top-k and rank-of-member
+  without sorting
+- QuizLeaderboards: per-quiz leaderboards built once from quiz_results.json and then
+  updated on every new result
+- RollingLeaderboards: all-time and weekly points leaderboards, global and per chat,
+  updated from quiz finalisation and persisted in MongoDB
+"""
+
+import datetime
+import logging
+import math
+import random
+import threading
+import time
+
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class _Infinity:
+    """Sentinel key that sorts after every real key"""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return self is other
+
+    def __gt__(self, other):
+        return self is not other
+
+    def __ge__(self, other):
+        return True
+
+
+_INFINITY = _Infinity()
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, next_nodes, widths):
+        self.key = key
+        self.next = next_nodes
+        self.width = widths
+
+
+class IndexedSkipList:
+    """
+    Skip list whose links record how many elements they span, so the
+    position of a key and the key at a position are found in O(log n).
+    """
+
+    def __init__(self, expected_size=1 << 20):
+        self.max_levels = max(1, int(1 + math.log2(expected_size)))
+        self._tail = _Node(_INFINITY, [], [])
+        self._head = _Node(None, [self._tail] * self.max_levels, [1] * self.max_levels)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _random_level(self):
+        level = 1
+        while level < self.max_levels and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key):
+        chain = [None] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = self._random_level()
+        new_node = _Node(key, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.max_levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain = [None] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is self._tail or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        """Number of keys smaller than key"""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node.key
+
+    def iter_from(self, index=0):
+        """Yield keys in order starting at a position, O(log n) to start then O(1) per key"""
+        if index >= self._size:
+            return
+        node = self._head
+        remaining = max(index, 0) + 1
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not self._tail:
+            yield node.key
+            node = node.next[0]
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+
+class Leaderboard:
+    """Members ranked by score (highest first); earlier arrivals win ties"""
+
+    def __init__(self):
+        self._index = IndexedSkipList()
+        self._members = {}   # member_id -> (key, entry)
+        self._next_seq = 0
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, member_id):
+        return str(member_id) in self._members
+
+    def _place(self, member_id, score, entry):
+        current = self._members.get(member_id)
+        if current is not None:
+            self._index.remove(current[0])
+            seq = current[0][1]
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+        key = (-score, seq, member_id)
+        self._index.insert(key)
+        self._members[member_id] = (key, entry)
+
+    def submit(self, member_id, score, entry):
+        """Keep the member's best score; returns True if the leaderboard changed"""
+        member_id = str(member_id)
+        score = float(score)
+        current = self._members.get(member_id)
+        if current is not None and -current[0][0] >= score:
+            return False
+        self._place(member_id, score, entry)
+        return True
+
+    def increment(self, member_id, points, entry):
+        """Add points to the member's running total and return the new total"""
+        member_id = str(member_id)
+        current = self._members.get(member_id)
+        total = (-current[0][0] if current is not None else 0.0) + float(points)
+        self._place(member_id, total, entry)
+        return total
+
+    def discard(self, member_id):
+        current = self._members.pop(str(member_id), None)
+        if current is not None:
+            self._index.remove(current[0])
+
+    def score(self, member_id):
+        current = self._members.get(str(member_id))
+        return -current[0][0] if current is not None else None
+
+    def rank_of(self, member_id):
+        """1-based rank of a member, or None if the member has no score"""
+        current = self._members.get(str(member_id))
+        if current is None:
+            return None
+        return self._index.rank(current[0]) + 1
+
+    def entry(self, member_id):
+        current = self._members.get(str(member_id))
+        return current[1] if current is not None else None
+
+    def top(self, k=None, offset=0):
+        """Ranked (rank, score, member_id, entry) tuples starting after offset"""
+        results = []
+        for position, key in enumerate(self._index.iter_from(offset), start=offset + 1):
+            if k is not None and len(results) >= k:
+                break
+            results.append((position, -key[0], key[2], self._members[key[2]][1]))
+        return results
+
+
+def _participant_score(participant):
+    try:
+        return float(participant.get("adjusted_score", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class QuizLeaderboards:
+    """Per-quiz best-score leaderboards over quiz_results.json participants"""
+
+    def __init__(self):
+        self._boards = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, results):
+        """Build every quiz leaderboard from the {quiz_id: {"participants": [...]}} structure"""
+        boards = {}
+        for quiz_id, quiz_data in (results or {}).items():
+            if not isinstance(quiz_data, dict):
+                continue
+            board = Leaderboard()
+            for participant in quiz_data.get("participants", []):
+                if isinstance(participant, dict):
+                    board.submit(participant.get("user_id", ""), _participant_score(participant), participant)
+            boards[str(quiz_id)] = board
+        with self._lock:
+            self._boards = boards
+            self._loaded = True
+        logger.info(f"Built leaderboards for {len(boards)} quizzes")
+
+    def ensure_loaded(self, load_results_func):
+        if not self._loaded:
+            self.load(load_results_func())
+
+    def invalidate(self):
+        """Rebuild on next use, e.g. after another process wrote quiz_results.json"""
+        self._loaded = False
+
+    def add_result(self, quiz_id, participant):
+        """Add one participant result; O(log n) in the quiz's participant count"""
+        if not self._loaded:
+            return
+        with self._lock:
+            board = self._boards.setdefault(str(quiz_id), Leaderboard())
+            board.submit(participant.get("user_id", ""), _participant_score(participant), participant)
+
+    def get(self, quiz_id):
+        return self._boards.get(str(quiz_id))
+
+    def ranked(self, quiz_id, k=None, offset=0):
+        """Participant dicts with a rank field, best first"""
+        board = self._boards.get(str(quiz_id))
+        if board is None:
+            return []
+        ranked = []
+        for rank, _, _, participant in board.top(k, offset):
+            participant_with_rank = participant.copy()
+            participant_with_rank["rank"] = rank
+            ranked.append(participant_with_rank)
+        return ranked
+
+    def rank_of(self, quiz_id, user_id):
+        """(rank, participant) for a user's best attempt, or None"""
+        board = self._boards.get(str(quiz_id))
+        if board is None:
+            return None
+        rank = board.rank_of(user_id)
+        return (rank, board.entry(user_id)) if rank is not None else None
+
+
+# ---------- rolling leaderboards across quizzes ----------
+
+PERIOD_ALL = "all"
+PERIOD_WEEK = "week"
+# ISO year and week, so a bucket is always a whole Monday-Sunday week, even across New Year
+WEEK_FORMAT = "%G-%V"
+
+_indexed_collections = set()
+
+
+def week_bucket(when):
+    return when.strftime(WEEK_FORMAT)
+
+
+def board_key(period, bucket=None, chat_id=None):
+    """Key of one rolling board: global or per-chat, all-time or one week"""
+    scope = f"chat:{chat_id}" if chat_id is not None else "global"
+    return f"{scope}:{period}" if period == PERIOD_ALL else f"{scope}:{period}:{bucket}"
+
+
+class RollingLeaderboards:
+    """
+    All-time and weekly leaderboards, globally and per chat, ranked by total
+    points across quizzes. Every finished quiz adds its points to four boards
+    in memory and in MongoDB; the boards are loaded once at startup, so
+    queries never scan quiz history. Only the current week is kept in memory.
+    """
+
+    def __init__(self):
+        self._boards = {}
+        self._current_week = None
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _rotate(self, bucket):
+        """Drop in-memory boards of previous weeks once a new week starts"""
+        if bucket == self._current_week:
+            return
+        suffix = f":{PERIOD_WEEK}:{bucket}"
+        for key in [k for k in self._boards if f":{PERIOD_WEEK}:" in k and not k.endswith(suffix)]:
+            del self._boards[key]
+        self._current_week = bucket
+
+    @staticmethod
+    def _targets(chat_id, bucket):
+        keys = [board_key(PERIOD_ALL), board_key(PERIOD_WEEK, bucket)]
+        if chat_id is not None:
+            keys += [board_key(PERIOD_ALL, chat_id=chat_id), board_key(PERIOD_WEEK, bucket, chat_id)]
+        return keys
+
+    def load(self, collection, now=None):
+        """
+        Load all-time boards and the current week from MongoDB (blocking).
+        Without a collection nothing is loaded and the next use tries again.
+        """
+        if collection is None:
+            logger.warning("MongoDB unavailable; rolling leaderboards not loaded yet")
+            return
+        bucket = week_bucket(now or datetime.datetime.now())
+        boards = {}
+        ensure_leaderboard_indexes(collection)
+        query = {"$or": [{"period": PERIOD_ALL}, {"period": PERIOD_WEEK, "bucket": bucket}]}
+        for doc in collection.find(query).sort("first_seen", ASCENDING):
+            board = boards.setdefault(doc["board"], Leaderboard())
+            board.increment(doc["user_id"], doc.get("points", 0), {
+                "user_name": doc.get("user_name", ""),
+                "quizzes": doc.get("quizzes", 0),
+                "correct": doc.get("correct", 0),
+            })
+        with self._lock:
+            self._boards = boards
+            self._current_week = bucket
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(boards)} rolling leaderboards")
+
+    def needs_load(self, max_age=None):
+        """Not loaded yet, or loaded more than max_age seconds ago (other processes also record points)"""
+        return not self._loaded or bool(max_age and time.monotonic() - self._loaded_at > max_age)
+
+    def ensure_loaded(self, collection, max_age=None):
+        """Load once, or again after max_age seconds when other processes also record points"""
+        if self.needs_load(max_age):
+            self.load(collection)
+
+    def record(self, collection, chat_id, results, now=None):
+        """
+        Add a finished quiz to the in-memory boards and return the MongoDB
+        writes for it; pass them to write_scores() (blocking, run it in a thread).
+        results: iterable of (user_id, user_name, points, correct) per participant.
+        """
+        now = now or datetime.datetime.now()
+        bucket = week_bucket(now)
+        operations = []
+        with self._lock:
+            self._rotate(bucket)
+            for user_id, user_name, points, correct in results:
+                user_id = str(user_id)
+                for key in self._targets(chat_id, bucket):
+                    board = self._boards.setdefault(key, Leaderboard())
+                    entry = dict(board.entry(user_id) or {"quizzes": 0, "correct": 0})
+                    entry["user_name"] = user_name
+                    entry["quizzes"] += 1
+                    entry["correct"] += correct
+                    board.increment(user_id, points, entry)
+                    if collection is not None:
+                        operations.append(_score_update(key, chat_id, bucket, user_id, user_name, points, correct, now))
+        return operations
+
+    def top(self, period=PERIOD_ALL, chat_id=None, k=10, now=None):
+        """(rank, points, user_id, entry) tuples for the top k of one board"""
+        board = self._board(period, chat_id, now)
+        return board.top(k) if board is not None else []
+
+    def rank_of(self, user_id, period=PERIOD_ALL, chat_id=None, now=None):
+        """(rank, points, member count) for a user on one board, or None"""
+        board = self._board(period, chat_id, now)
+        if board is None or user_id not in board:
+            return None
+        return board.rank_of(user_id), board.score(user_id), len(board)
+
+    def _board(self, period, chat_id, now):
+        bucket = week_bucket(now or datetime.datetime.now()) if period == PERIOD_WEEK else None
+        if bucket is not None and bucket != self._current_week:
+            return None
+        return self._boards.get(board_key(period, bucket, chat_id))
+
+
+def write_scores(collection, operations):
+    """Apply the writes returned by RollingLeaderboards.record()"""
+    if operations:
+        ensure_leaderboard_indexes(collection)
+        collection.bulk_write(operations, ordered=False)
+
+
+def ensure_leaderboard_indexes(collection):
+    """Index the startup load by period and week once per process"""
+    if collection is None or collection.full_name in _indexed_collections:
+        return
+    try:
+        collection.create_index([("period", ASCENDING), ("bucket", ASCENDING)])
+    except Exception as e:
+        logger.error(f"Could not index {collection.full_name}: {e}")
+    _indexed_collections.add(collection.full_name)
+
+
+def _score_update(key, chat_id, bucket, user_id, user_name, points, correct, now):
+    period = PERIOD_ALL if key.endswith(f":{PERIOD_ALL}") else PERIOD_WEEK
+    return UpdateOne(
+        {"_id": f"{key}:{user_id}"},
+        {
+            "$inc": {"points": points, "quizzes": 1, "correct": correct},
+            "$set": {"user_name": user_name},
+            "$setOnInsert": {
+                "board": key,
+                "period": period,
+                "bucket": bucket if period == PERIOD_WEEK else None,
+                "chat_id": str(chat_id) if key.startswith("chat:") else None,
+                "user_id": user_id,
+                "first_seen": now,
+            },
+        },
+        upsert=True,
+    )
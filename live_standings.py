@@ -0,0 +1,100 @@
+"""
+Live standings message for running group quizzes
+- One message per chat, edited in place while answers arrive
+- Edits are coalesced: at most one edit per interval per chat, however many
+  answers come in, always showing the latest state
+- Text is rendered from the in-memory quiz session only when an edit is due
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two edits of the same chat's standings message
+LIVE_EDIT_INTERVAL_SECONDS = 5
+
+
+class _Board:
+    __slots__ = ("message_id", "last_edit", "last_text", "render", "task")
+
+    def __init__(self, message_id, text):
+        self.message_id = message_id
+        self.last_edit = time.monotonic()
+        self.last_text = text
+        self.render = None
+        self.task = None
+
+
+class LiveStandings:
+    """Debounced, edit-in-place standings messages keyed by chat"""
+
+    def __init__(self, interval=LIVE_EDIT_INTERVAL_SECONDS):
+        self.interval = interval
+        self._boards = {}
+        self.edits = 0
+        self.coalesced = 0
+
+    def is_open(self, chat_id):
+        return chat_id in self._boards
+
+    async def open(self, bot, chat_id, text):
+        """Send the standings message for a chat (replacing any previous one)"""
+        await self.close(bot, chat_id)
+        message = await bot.send_message(chat_id=chat_id, text=text)
+        self._boards[chat_id] = _Board(message.message_id, text)
+
+    def request_update(self, bot, chat_id, render):
+        """
+        Ask for the standings to be refreshed with render().
+        Requests arriving before the next edit is due are merged into it.
+        """
+        board = self._boards.get(chat_id)
+        if board is None:
+            return False
+        board.render = render
+        if board.task is not None:
+            self.coalesced += 1
+            return True
+        delay = max(0.0, board.last_edit + self.interval - time.monotonic())
+        board.task = asyncio.create_task(self._flush(bot, chat_id, board, delay))
+        return True
+
+    async def _flush(self, bot, chat_id, board, delay):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            render, board.render = board.render, None
+            board.last_edit = time.monotonic()
+            # Requests from here on schedule the next edit
+            board.task = None
+            if render is None or self._boards.get(chat_id) is not board:
+                return
+            text = render()
+            if text == board.last_text:
+                return
+            await bot.edit_message_text(chat_id=chat_id, message_id=board.message_id, text=text)
+            board.last_text = text
+            self.edits += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if "not modified" not in str(e).lower():
+                logger.error(f"Error updating live standings in chat {chat_id}: {e}")
+
+    async def close(self, bot, chat_id, text=None):
+        """Stop updating a chat's standings, optionally with a final edit"""
+        board = self._boards.pop(chat_id, None)
+        if board is None:
+            return
+        if board.task is not None:
+            board.task.cancel()
+        if text and text != board.last_text:
+            try:
+                await bot.edit_message_text(chat_id=chat_id, message_id=board.message_id, text=text)
+            except Exception as e:
+                logger.error(f"Error closing live standings in chat {chat_id}: {e}")
+
+    def stats(self):
+        return {"open": len(self._boards), "edits": self.edits, "coalesced": self.coalesced}
@@ -0,0 +1,101 @@
+"""
+Benchmark of logging cost on the caller's thread (the event loop, in the bot)
+- Disabled DEBUG calls: an f-string is built (and its arguments evaluated) even
+  though nothing is logged; %-style arguments are never formatted
+- Enabled INFO calls: a synchronous StreamHandler formats and writes on the
+  caller's thread; the queue handler from log_config hands the record to a
+  listener thread; the per-call-site rate limit drops most of a hot loop's
+  records before they are queued
+
+Usage:
+    python log_benchmark.py [--calls 100000] [--keys 500]
+
+Output goes to a temporary file so terminal speed does not skew the numbers.
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+
+from log_config import CallSiteRateLimit, NonBlockingQueueHandler, StructuredFormatter
+
+
+def _logger(name, handler=None, level=logging.INFO):
+    logger = logging.getLogger(f"log_benchmark.{name}")
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.setLevel(level)
+    if handler is not None:
+        logger.addHandler(handler)
+    return logger
+
+
+def _time_calls(calls, log_once):
+    """CPU seconds spent on the calling thread (the listener's work is not counted)"""
+    started = time.thread_time()
+    for i in range(calls):
+        log_once(i)
+    return time.thread_time() - started
+
+
+def run(calls, keys, output_path):
+    """(scenario, CPU seconds on the caller's thread, note) for each scenario"""
+    sent_polls = {f"poll{i}": {"answers": {}} for i in range(keys)}
+    results = []
+
+    logger = _logger("disabled")
+    seconds = _time_calls(calls, lambda i: logger.debug(f"Checking poll_id {i} against keys: {list(sent_polls.keys())}"))
+    results.append(("DEBUG off, f-string", seconds, f"formats a {keys}-key list every call"))
+    seconds = _time_calls(calls, lambda i: logger.debug("Checking poll_id %s against keys: %s", i, sent_polls.keys()))
+    results.append(("DEBUG off, %-style args", seconds, "level check only"))
+
+    with open(output_path, "w") as stream:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(StructuredFormatter())
+        logger = _logger("sync", handler)
+        seconds = _time_calls(calls, lambda i: logger.info(f"Poll answer from user {i} for poll poll{i % keys}"))
+        results.append(("INFO, sync handler, f-string", seconds, "format + write on caller"))
+        seconds = _time_calls(calls, lambda i: logger.info("Poll answer from user %s for poll poll%s", i, i % keys))
+        results.append(("INFO, sync handler, %-style", seconds, "format + write on caller"))
+
+        log_queue = queue.Queue(maxsize=calls + 1)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        logger = _logger("queued", queue_handler)
+        listener.start()
+        seconds = _time_calls(calls, lambda i: logger.info("Poll answer from user %s for poll poll%s", i, i % keys))
+        drain_started = time.perf_counter()
+        listener.stop()
+        drained = time.perf_counter() - drain_started
+        results.append(("INFO, queue handler, %-style", seconds, f"listener still busy {drained:.2f}s after the loop"))
+
+        rate_limit = CallSiteRateLimit(10)
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=calls + 1))
+        queue_handler.addFilter(rate_limit)
+        logger = _logger("limited", queue_handler)
+        seconds = _time_calls(calls, lambda i: logger.info("Poll answer from user %s for poll poll%s", i, i % keys))
+        results.append(("INFO, queue handler, rate limited", seconds, f"{rate_limit.suppressed_total} suppressed"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the caller-side cost of logging")
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=500, help="Size of the dict the f-string example dumps")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(max(1, args.calls), max(1, args.keys), os.path.join(directory, "benchmark.log"))
+    print(f"{args.calls} calls per scenario, CPU time on the calling thread:\n")
+    for name, seconds, note in results:
+        print(f"{name:36s} {seconds * 1e6 / args.calls:9.2f} us/call  {seconds:7.3f}s  {note}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Asynchronous, structured logging
+- setup_logging() sends every record through a QueueHandler to a single
+  QueueListener thread, so code on the event loop never waits for formatting or
+  for stderr writes
+- Records are formatted by the listener thread; calls with %-style arguments
+  are not formatted at all when their level is disabled
+- Structured fields: keys passed with extra={...} are appended as key=value
+  (LOG_FORMAT=text, the default) or included in a JSON object (LOG_FORMAT=json)
+- Per-logger levels come from LOG_LEVELS, e.g. "httpx=WARNING,simple_bot=DEBUG"
+- Per-update messages (INFO and below) are rate limited per call site: at most
+  LOG_RATE_LIMIT records per second from any one logging call. The next record
+  that gets through carries the number that was suppressed
+- When the queue is full, records are dropped and counted rather than blocking;
+  drops and suppressions are exported for /metrics
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_RATE_LIMIT = 10  # Records per second per call site, 0 = no limit
+
+# Loggers that log every request or update at INFO
+DEFAULT_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING"}
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def record_fields(record):
+    """The structured fields of a record (its extra={...} keys)"""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class StructuredFormatter(logging.Formatter):
+    """The usual text line with key=value fields appended, or one JSON object per record"""
+
+    def __init__(self, json_lines=False):
+        super().__init__(TEXT_FORMAT)
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = record_fields(record)
+        if not self.json_lines:
+            line = super().format(record)
+            if fields:
+                line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+            return line
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **{key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+               for key, value in fields.items()},
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class CallSiteRateLimit(logging.Filter):
+    """
+    Lets through at most limit records per second from each logging call
+    (file and line). WARNING and above always pass.
+    """
+
+    def __init__(self, limit=DEFAULT_RATE_LIMIT, always_level=logging.WARNING):
+        super().__init__()
+        self.limit = limit
+        self.always_level = always_level
+        self.suppressed_total = 0
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.limit <= 0 or record.levelno >= self.always_level:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window, count, suppressed = self._sites.get(site, (now, 0, 0))
+            if now - window >= 1.0:
+                window, count = now, 0
+            if count >= self.limit:
+                self._sites[site] = (window, count, suppressed + 1)
+                self.suppressed_total += 1
+                return False
+            self._sites[site] = (window, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that hands the record over unformatted and drops it if the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Same process: the listener thread formats the original record. The
+        # stock prepare() formats here, on the caller's thread.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec):
+    """{"logger": "LEVEL"} from "name=LEVEL,name=LEVEL" """
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class AsyncLogging:
+    """The process's logging pipeline: queue handler, rate limit and listener thread"""
+
+    def __init__(self, level="INFO", json_lines=False, levels=None, rate_limit=DEFAULT_RATE_LIMIT,
+                 queue_size=DEFAULT_QUEUE_SIZE, stream=None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.rate_limit = CallSiteRateLimit(rate_limit)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(self.rate_limit)
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(StructuredFormatter(json_lines))
+        self.listener = logging.handlers.QueueListener(self.queue, output, respect_handler_level=True)
+        self.level = level
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self._started = False
+
+    def install(self, root=None):
+        root = root or logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        for name, level in self.levels.items():
+            logging.getLogger(name).setLevel(level)
+        self.listener.start()
+        self._started = True
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flush queued records and stop the listener thread (idempotent)"""
+        if self._started:
+            self._started = False
+            self.listener.stop()
+
+    def metrics_text(self):
+        """Queue depth, drops and rate-limited records in Prometheus text format"""
+        return (
+            "# TYPE quizbot_log_queue_depth gauge\n"
+            f"quizbot_log_queue_depth {self.queue.qsize()}\n"
+            "# TYPE quizbot_log_records_dropped_total counter\n"
+            f"quizbot_log_records_dropped_total {self.handler.dropped}\n"
+            "# TYPE quizbot_log_records_suppressed_total counter\n"
+            f"quizbot_log_records_suppressed_total {self.rate_limit.suppressed_total}\n"
+        )
+
+
+_installed = None
+
+
+def setup_logging():
+    """Install asynchronous logging for this process from the LOG_* environment variables (once)"""
+    global _installed
+    if _installed is None:
+        _installed = AsyncLogging(
+            level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+            json_lines=os.environ.get("LOG_FORMAT", "text").lower() == "json",
+            levels=parse_levels(os.environ.get("LOG_LEVELS", "")),
+            rate_limit=int(os.environ.get("LOG_RATE_LIMIT", str(DEFAULT_RATE_LIMIT))),
+            queue_size=int(os.environ.get("LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))),
+        )
+        _installed.install()
+    return _installed
@@ -0,0 +1,198 @@
+"""
+Event-loop lag monitor and blocking-call detector
+- A sampler task sleeps for a fixed interval and records how late it wakes up:
+  the lag every other coroutine on the loop sees as well
+- A watchdog thread notices when the sampler stops ticking, grabs the loop
+  thread's stack while it is still blocked and attributes it to the running
+  handler, like asyncio debug mode's slow-callback warnings but always on
+- Lag histogram, per-handler blocking counters and a rolling list of recent
+  stalls with their stacks, for /metrics and the owner's /looplag report
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from perf_metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_SECONDS = 0.1
+DEFAULT_THRESHOLD_SECONDS = 0.25
+
+# Stalls kept for the owner report
+RECENT_STALLS = 50
+
+# Frames kept per captured stack, innermost last
+STACK_DEPTH = 12
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stall:
+    """One period the loop was blocked for longer than the threshold"""
+
+    __slots__ = ("at", "seconds", "handler", "stack")
+
+    def __init__(self, at, seconds, handler, stack):
+        self.at = at
+        self.seconds = seconds
+        self.handler = handler
+        self.stack = stack
+
+    @property
+    def location(self):
+        """Innermost frame in the bot's own code, e.g. "simple_bot.py:4120 save_quiz_results" """
+        for frame in reversed(self.stack):
+            if frame.filename.startswith(_PROJECT_DIR):
+                return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+        if self.stack:
+            frame = self.stack[-1]
+            return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+        return "unknown"
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag and captures the stack of whatever blocks it.
+    task_label(task) names the handler a task is running (None if unknown).
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS, threshold=DEFAULT_THRESHOLD_SECONDS, task_label=None):
+        self.interval = interval
+        self.threshold = threshold
+        self.task_label = task_label
+        self.lag = LatencyHistogram()
+        self.max_lag = 0.0
+        self.stalls = deque(maxlen=RECENT_STALLS)
+        self.blocked = {}
+        self._loop = None
+        self._loop_thread_id = None
+        self._heartbeat = 0.0
+        self._capture = None
+        self._capture_lock = threading.Lock()
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._sample(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop lag monitor started (threshold {self.threshold * 1000:.0f} ms)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- loop side ----------
+
+    async def _sample(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            previous, self._heartbeat = self._heartbeat, now
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._record_stall(lag, previous)
+
+    def _record_stall(self, lag, previous_heartbeat):
+        with self._capture_lock:
+            capture, self._capture = self._capture, None
+        # Only use a capture the watchdog took during this stall
+        if capture is not None and capture[0] == previous_heartbeat:
+            handler, stack = capture[1], capture[2]
+        else:
+            handler, stack = "unknown", []
+        stall = Stall(time.time(), lag, handler, stack)
+        self.stalls.append(stall)
+        count, total, worst = self.blocked.get(handler, (0, 0.0, 0.0))
+        self.blocked[handler] = (count + 1, total + lag, max(worst, lag))
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms by {handler} at {stall.location}")
+
+    # ---------- watchdog thread ----------
+
+    def _watch(self):
+        captured_for = None
+        while not self._stop.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            if heartbeat == captured_for:
+                continue
+            if time.monotonic() - heartbeat < self.interval + self.threshold:
+                continue
+            # The loop has missed its wakeup by more than the threshold and is still blocked
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)[-STACK_DEPTH:]
+            del frame
+            handler = self._current_handler()
+            with self._capture_lock:
+                self._capture = (heartbeat, handler, stack)
+            captured_for = heartbeat
+
+    def _current_handler(self):
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        if task is None:
+            return "loop callback"
+        label = self.task_label(task) if self.task_label else None
+        return label or task.get_name()
+
+    # ---------- reporting ----------
+
+    def heartbeat_age(self):
+        """Seconds since the sampler last woke up, None if not running"""
+        if self._task is None:
+            return None
+        return time.monotonic() - self._heartbeat
+
+    def recent_lag(self, samples=50):
+        """Worst lag over the last samples wakeups (5 s at the default interval)"""
+        recent = list(self.lag.recent)[-samples:]
+        return max(recent) if recent else 0.0
+
+    def top_blockers(self, limit=10):
+        """(handler, count, total seconds, worst seconds), most total blocking first"""
+        rows = [(handler, *stats) for handler, stats in self.blocked.items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:limit]
+
+    def metrics_text(self):
+        """Lag histogram and per-handler blocking counters in Prometheus text format"""
+        lines = ["# TYPE quizbot_loop_lag_seconds histogram"]
+        lines.extend(self.lag.exposition("quizbot_loop_lag_seconds", 'loop="main"'))
+        lines.append("# TYPE quizbot_loop_lag_max_seconds gauge")
+        lines.append(f"quizbot_loop_lag_max_seconds {self.max_lag:.6f}")
+        lines.append("# TYPE quizbot_loop_blocked_total counter")
+        lines.append("# TYPE quizbot_loop_blocked_seconds_sum counter")
+        for handler, (count, total, _) in sorted(self.blocked.items()):
+            label = str(handler).replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'quizbot_loop_blocked_total{{handler="{label}"}} {count}')
+            lines.append(f'quizbot_loop_blocked_seconds_sum{{handler="{label}"}} {total:.6f}')
+        return "\n".join(lines) + "\n"
@@ -9,6 +9,7 @@ import logging
 
 # Import the Flask app for gunicorn
 from app_module import app
+from health import DEFAULT_BOT_HEALTH_PORT
 
 # Configure logging
 logging.basicConfig(
@@ -38,6 +39,16 @@ def start_web_only():
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
     
+def start_webhook():
+    """Start the bot in webhook mode: updates, /health and /metrics served by the bot process itself"""
+    logger.info("Starting in WEBHOOK mode")
+    try:
+        sys.path.append(os.getcwd())
+        import simple_bot
+        simple_bot.main(mode="webhook")
+    except Exception as e:
+        logger.error(f"Error starting bot: {e}")
+
 def start_combined():
     """Start both the web server and bot (for production)"""
     logger.info("Starting in COMBINED mode")
@@ -46,7 +57,10 @@ def start_combined():
     try:
         import subprocess
         logger.info("Starting bot in a separate process...")
-        process = subprocess.Popen(["python", "bot_standalone.py"])
+        # The bot serves its own health checks on METRICS_PORT; the web server's /health relays them
+        env = dict(os.environ)
+        env.setdefault("METRICS_PORT", str(DEFAULT_BOT_HEALTH_PORT))
+        process = subprocess.Popen(["python", "bot_standalone.py"], env=env)
         logger.info(f"Bot started in separate process with PID {process.pid}")
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
@@ -61,6 +75,8 @@ if len(sys.argv) > 1:
         EXECUTION_MODE = "bot"
     elif sys.argv[1] == "--web-only":
         EXECUTION_MODE = "web"
+    elif sys.argv[1] == "--webhook":
+        EXECUTION_MODE = "webhook"
 
 # Call the appropriate function based on execution mode
 if __name__ == "__main__":
@@ -68,6 +84,8 @@ if __name__ == "__main__":
         start_bot_only()
     elif EXECUTION_MODE == "web":
         start_web_only()
+    elif EXECUTION_MODE == "webhook":
+        start_webhook()
     else:
         # Default is combined mode
         start_combined()
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Cached channel-membership verification for force subscription
+- Resolves the channel's numeric ID once instead of on every check
+- Caches membership results with separate positive and negative TTLs
+- Coalesces concurrent checks for the same user into one Bot API call
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Members rarely leave, so positive results can be trusted for a while
+POSITIVE_TTL_SECONDS = 6 * 60 * 60
+
+# Non-members are re-checked soon so joining the channel takes effect quickly
+NEGATIVE_TTL_SECONDS = 60
+
+# API errors are cached briefly to avoid hammering a failing endpoint
+ERROR_TTL_SECONDS = 15
+
+# Retry resolving the channel ID after a failure no sooner than this
+RESOLVE_RETRY_SECONDS = 300
+
+# Upper bound on cached users; oldest entries are dropped first
+MAX_CACHED_USERS = 50000
+
+MEMBER_STATUSES = ('member', 'creator', 'administrator', 'owner')
+
+
+class ChannelMembershipCache:
+    """Membership lookups for one channel with TTL caching and request coalescing"""
+
+    def __init__(self, channel_username, channel_id=None, placeholder_id=None):
+        self.channel_username = channel_username if channel_username.startswith('@') else f"@{channel_username}"
+        # A placeholder ID means the real ID has to be resolved through get_chat
+        self.channel_id = channel_id if channel_id and channel_id != placeholder_id else None
+        self._resolve_failed_at = 0.0
+        self._resolve_lock = asyncio.Lock()
+        self._cache = {}      # user_id -> (is_member, expires_at)
+        self._inflight = {}   # user_id -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+
+    async def resolve_channel_id(self, bot):
+        """Return the channel's numeric ID, resolving it through get_chat only once"""
+        if self.channel_id is not None:
+            return self.channel_id
+        if time.monotonic() - self._resolve_failed_at < RESOLVE_RETRY_SECONDS:
+            return None
+        async with self._resolve_lock:
+            if self.channel_id is not None:
+                return self.channel_id
+            try:
+                self.api_calls += 1
+                chat = await bot.get_chat(self.channel_username)
+                self.channel_id = chat.id
+                logger.info(f"Resolved channel {self.channel_username} to ID {self.channel_id}")
+            except Exception as e:
+                self._resolve_failed_at = time.monotonic()
+                logger.error(f"Could not resolve channel {self.channel_username}: {e}")
+        return self.channel_id
+
+    def _store(self, user_id, is_member, ttl):
+        self._cache.pop(user_id, None)
+        if len(self._cache) >= MAX_CACHED_USERS:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[user_id] = (is_member, time.monotonic() + ttl)
+
+    def forget(self, user_id):
+        """Drop a cached result, e.g. after the user pressed "Check Again" """
+        self._cache.pop(user_id, None)
+
+    async def _fetch(self, bot, user_id):
+        chat_id = await self.resolve_channel_id(bot) or self.channel_username
+        try:
+            self.api_calls += 1
+            chat_member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            is_member = chat_member.status in MEMBER_STATUSES
+            self._store(user_id, is_member, POSITIVE_TTL_SECONDS if is_member else NEGATIVE_TTL_SECONDS)
+            logger.debug(f"Membership of user {user_id} in {chat_id}: {chat_member.status}")
+            return is_member
+        except Exception as e:
+            self._store(user_id, False, ERROR_TTL_SECONDS)
+            logger.warning(f"Membership check failed for user {user_id}: {e}")
+            return False
+
+    async def is_member(self, bot, user_id):
+        """Return whether the user is a channel member, using the cache when possible"""
+        cached = self._cache.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+
+        # Another handler is already asking about this user: wait for its answer
+        pending = self._inflight.get(user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            result = await self._fetch(bot, user_id)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(user_id, None)
+
+    def stats(self):
+        return {
+            "cached_users": len(self._cache),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "api_calls": self.api_calls,
+            "channel_id": self.channel_id,
+        }
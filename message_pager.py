@@ -0,0 +1,108 @@
+"""
+Chunking and pagination for long bot messages
+- chunk_entries() splits a header, entries and footer into parts under Telegram's length limit
+- PagedResults keeps finalised result lists for "next page" callbacks, bounded LRU
+- Pages are rendered only when requested, so a quiz with thousands of participants
+  costs one short message up front
+"""
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages over 4096 characters; leave room for formatting
+MAX_MESSAGE_LENGTH = 4000
+
+RESULTS_PAGE_SIZE = 20
+
+# Finalised results kept for page callbacks; older ones answer "expired"
+MAX_STORED_RESULTS = 500
+
+PAGE_CALLBACK_PREFIX = "respage"
+
+
+def chunk_entries(entries, header="", footer="", limit=MAX_MESSAGE_LENGTH):
+    """Join entries into as few messages as possible, each at most limit characters"""
+    parts = []
+    current = header
+    for entry in entries:
+        if current and len(current) + len(entry) > limit:
+            parts.append(current)
+            current = ""
+        # A single oversized entry is split rather than dropped
+        while len(entry) > limit:
+            parts.append(entry[:limit])
+            entry = entry[limit:]
+        current += entry
+    if footer:
+        if current and len(current) + len(footer) > limit:
+            parts.append(current)
+            current = ""
+        current += footer
+    if current:
+        parts.append(current)
+    return parts
+
+
+def page_count(total, page_size=RESULTS_PAGE_SIZE):
+    return max(1, (total + page_size - 1) // page_size)
+
+
+def page_slice(total, page, page_size=RESULTS_PAGE_SIZE):
+    """(start, end) indexes of a page, with the page clamped to the valid range"""
+    page = min(max(page, 0), page_count(total, page_size) - 1)
+    start = page * page_size
+    return start, min(start + page_size, total)
+
+
+def page_buttons(result_id, page, pages):
+    """Navigation buttons as (label, callback_data) pairs for one keyboard row"""
+    buttons = []
+    if page > 0:
+        buttons.append(("◀️ Prev", f"{PAGE_CALLBACK_PREFIX}:{result_id}:{page - 1}"))
+    if pages > 1:
+        buttons.append((f"{page + 1}/{pages}", f"{PAGE_CALLBACK_PREFIX}:{result_id}:{page}"))
+    if page < pages - 1:
+        buttons.append(("Next ▶️", f"{PAGE_CALLBACK_PREFIX}:{result_id}:{page + 1}"))
+    return buttons
+
+
+def parse_page_callback(data):
+    """(result_id, page) from a page callback, or None if malformed"""
+    try:
+        prefix, result_id, page = data.split(":")
+        if prefix != PAGE_CALLBACK_PREFIX:
+            return None
+        return result_id, int(page)
+    except (AttributeError, ValueError):
+        return None
+
+
+class PagedResults:
+    """Finalised result objects addressed by a short id, oldest evicted first"""
+
+    def __init__(self, max_results=MAX_STORED_RESULTS):
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def store(self, result):
+        result_id = uuid.uuid4().hex[:10]
+        with self._lock:
+            self._results[result_id] = result
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return result_id
+
+    def get(self, result_id):
+        with self._lock:
+            result = self._results.get(result_id)
+            if result is not None:
+                self._results.move_to_end(result_id)
+            return result
+
+    def __len__(self):
+        return len(self._results)
@@ -0,0 +1,237 @@
+"""
+Handler latency and throughput instrumentation
+- Per-handler latency histograms and error counts, by wrapping each registered
+  handler's callback once at startup
+- Update counts by type (group -1 TypeHandler) and end-to-end update latency
+  (post-hook called by the update processor when an update is done)
+- Bot API call latency and errors by method, via an instrumented HTTPXRequest
+- Prometheus text exposition for /metrics and p50/p95/p99 for /perf
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import time
+from collections import Counter, deque
+
+from telegram import Update
+from telegram.ext import CommandHandler, ConversationHandler
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent samples kept per series for percentiles
+RECENT_SAMPLES = 2048
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts for Prometheus plus a window of recent samples for percentiles"""
+
+    __slots__ = ("buckets", "count", "total", "errors", "recent")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds, error=False):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.errors += error
+        self.recent.append(seconds)
+
+    def percentiles(self, points=PERCENTILES):
+        """{point: seconds} over the recent window (nearest rank), empty if no samples"""
+        samples = sorted(self.recent)
+        if not samples:
+            return {}
+        last = len(samples) - 1
+        return {p: samples[min(last, max(0, int(round(p / 100 * len(samples))) - 1))] for p in points}
+
+    def exposition(self, name, labels):
+        """Prometheus histogram lines for this series"""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def update_type(update):
+    """The populated field of an update, e.g. "message" or "poll_answer" """
+    if isinstance(update, Update):
+        for field in Update.ALL_TYPES:
+            if getattr(update, field, None) is not None:
+                return str(field)
+    return type(update).__name__.lower()
+
+
+def handler_name(handler):
+    """Readable name for a handler: /command for command handlers, else the callback's name"""
+    if isinstance(handler, CommandHandler):
+        return "/" + sorted(handler.commands)[0]
+    callback = inspect.unwrap(handler.callback)
+    return getattr(callback, "__name__", type(handler).__name__)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class PerfMetrics:
+    """Process-wide latency and throughput counters"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.handlers = {}
+        self.updates = {}
+        self.update_counts = Counter()
+        self.api = {}
+        # Wall time of the last successful call per Bot API method, for health checks
+        self.api_last_ok = {}
+        # Handler each running task is in, for attributing event-loop stalls
+        self.active = {}
+
+    # ---------- recording ----------
+
+    @staticmethod
+    def _series(table, key):
+        series = table.get(key)
+        if series is None:
+            series = table[key] = LatencyHistogram()
+        return series
+
+    def observe_handler(self, name, seconds, error=False):
+        self._series(self.handlers, name).observe(seconds, error)
+
+    def observe_update(self, update, seconds, error=False):
+        self._series(self.updates, update_type(update)).observe(seconds, error)
+
+    def observe_api(self, method, seconds, error=False):
+        self._series(self.api, method).observe(seconds, error)
+        if not error:
+            self.api_last_ok[method] = time.time()
+
+    async def count_update(self, update, context):
+        """Group -1 TypeHandler callback: counts every incoming update by type"""
+        self.update_counts[update_type(update)] += 1
+
+    # ---------- instrumentation ----------
+
+    def _wrap(self, handler):
+        callback = handler.callback
+        if getattr(callback, "_perf_instrumented", False):
+            return
+        name = handler_name(handler)
+
+        @functools.wraps(callback)
+        async def timed(update, context, *args, **kwargs):
+            task = asyncio.current_task()
+            outer = self.active.get(task)
+            self.active[task] = name
+            started = time.perf_counter()
+            error = False
+            try:
+                return await callback(update, context, *args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.observe_handler(name, time.perf_counter() - started, error)
+                if outer is None:
+                    self.active.pop(task, None)
+                else:
+                    self.active[task] = outer
+
+        timed._perf_instrumented = True
+        handler.callback = timed
+
+    def instrument_handler(self, handler):
+        """Time a handler's callback; conversation handlers are timed per inner handler"""
+        if isinstance(handler, ConversationHandler):
+            inner = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                inner.extend(state_handlers)
+            for child in inner:
+                self.instrument_handler(child)
+        elif getattr(handler, "callback", None) == self.count_update:
+            return
+        elif hasattr(handler, "callback") and inspect.iscoroutinefunction(inspect.unwrap(handler.callback)):
+            self._wrap(handler)
+
+    def instrument_application(self, application):
+        """Wrap every handler registered so far (call after all add_handler calls)"""
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                self.instrument_handler(handler)
+
+    def handler_for_task(self, task):
+        """Name of the handler a task is currently running, or None"""
+        return self.active.get(task)
+
+    # ---------- reporting ----------
+
+    def metrics_text(self):
+        """All series in Prometheus text format"""
+        lines = ["# TYPE quizbot_updates_received_total counter"]
+        for kind, count in sorted(self.update_counts.items()):
+            lines.append(f'quizbot_updates_received_total{{type="{kind}"}} {count}')
+        for metric, label, table in (
+            ("quizbot_update_seconds", "type", self.updates),
+            ("quizbot_handler_seconds", "handler", self.handlers),
+            ("quizbot_bot_api_seconds", "method", self.api),
+        ):
+            lines.append(f"# TYPE {metric} histogram")
+            for key, series in sorted(table.items()):
+                lines.extend(series.exposition(metric, f'{label}="{_escape(key)}"'))
+            errors = metric.replace("_seconds", "_errors_total")
+            lines.append(f"# TYPE {errors} counter")
+            for key, series in sorted(table.items()):
+                lines.append(f'{errors}{{{label}="{_escape(key)}"}} {series.errors}')
+        return "\n".join(lines) + "\n"
+
+    def rows(self, table, limit=None):
+        """(name, count, errors, {p: seconds}) sorted by p95, slowest first"""
+        rows = [(key, s.count, s.errors, s.percentiles()) for key, s in table.items() if s.count]
+        rows.sort(key=lambda row: row[3].get(95, 0), reverse=True)
+        return rows[:limit] if limit else rows
+
+    def update_rates(self):
+        """(type, count, per minute) since start, busiest first"""
+        minutes = max((time.time() - self.started_at) / 60, 1 / 60)
+        return [(kind, count, count / minutes) for kind, count in self.update_counts.most_common()]
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API call latency by method"""
+
+    def __init__(self, metrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        error = True
+        try:
+            code, payload = await super().do_request(url, method, request_data, **kwargs)
+            error = code >= 400
+            return code, payload
+        finally:
+            self.metrics.observe_api(api_method, time.perf_counter() - started, error)
@@ -0,0 +1,148 @@
+"""
+Read-through cache for user profiles and their rendered reports
+- Bounded LRU of profile documents with a TTL, so repeated /userprofile,
+  refresh and download taps don't query MongoDB every time
+- Per-user version stamps, bumped by the quiz-end write path; only the most
+  recently bumped users keep their own, the rest share a floor version
+- Rendered artifacts (profile text, HTML, PDF paths) are reused while the
+  user's version is unchanged
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_TTL_SECONDS = 300
+PROFILE_CACHE_MAX_ENTRIES = 5000
+
+# Rendered artifacts are larger than profiles, so fewer are kept
+ARTIFACT_CACHE_MAX_ENTRIES = 1000
+
+# Profile documents cached per user, as passed to get_profile()
+PROFILE_KINDS = ("activity", "detailed")
+
+# Users with a version stamp of their own; enough for every cached entry
+VERSION_MAX_ENTRIES = PROFILE_CACHE_MAX_ENTRIES + ARTIFACT_CACHE_MAX_ENTRIES
+
+
+class ProfileCache:
+    """LRU + TTL cache of profile documents and rendered artifacts, keyed by user"""
+
+    def __init__(self, ttl=PROFILE_CACHE_TTL_SECONDS, max_entries=PROFILE_CACHE_MAX_ENTRIES,
+                 max_artifacts=ARTIFACT_CACHE_MAX_ENTRIES, max_versions=VERSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_artifacts = max_artifacts
+        self.max_versions = max_versions
+        self._profiles = OrderedDict()    # (kind, user_id) -> (version, expires_at, profile)
+        self._artifacts = OrderedDict()   # (user_id, name) -> (version, expires_at, artifact)
+        self._versions = OrderedDict()    # user_id -> version, least recently bumped first
+        self._counter = 0                 # last version handed out
+        self._floor = 0                   # version of users not in _versions
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id):
+        return self._versions.get(str(user_id), self._floor)
+
+    def invalidate(self, user_id):
+        """Bump the user's version so cached profiles and artifacts are rebuilt"""
+        user_id = str(user_id)
+        with self._lock:
+            self._counter += 1
+            self._versions[user_id] = self._counter
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_versions:
+                # A forgotten user falls back to the floor, which is at least their last
+                # version, so nothing stamped before their last bump becomes valid again
+                _, dropped = self._versions.popitem(last=False)
+                self._floor = max(self._floor, dropped)
+            for kind in PROFILE_KINDS:
+                self._profiles.pop((kind, user_id), None)
+
+    @staticmethod
+    def _lookup(store, key, version):
+        entry = store.get(key)
+        if entry is None:
+            return None
+        if entry[0] != version or entry[1] <= time.monotonic():
+            del store[key]
+            return None
+        store.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _insert(store, key, value, limit):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    # ---------- profiles ----------
+
+    def get_profile(self, kind, user_id, loader):
+        """
+        Return a copy of the cached profile, calling loader() on a miss.
+        Missing profiles (None) are not cached so a first quiz shows up at once.
+        """
+        if kind not in PROFILE_KINDS:
+            raise ValueError(f"Unknown profile kind: {kind}")
+        user_id = str(user_id)
+        key = (kind, user_id)
+        with self._lock:
+            version = self.version(user_id)
+            entry = self._lookup(self._profiles, key, version)
+            if entry is not None:
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            self.misses += 1
+
+        profile = loader()
+        if profile is not None:
+            with self._lock:
+                # Skip storing if a write invalidated the user while we were loading
+                if self.version(user_id) == version:
+                    self._insert(self._profiles, key,
+                                 (version, time.monotonic() + self.ttl, copy.deepcopy(profile)),
+                                 self.max_entries)
+        return profile
+
+    # ---------- rendered artifacts ----------
+
+    def get_artifact(self, user_id, name):
+        """Return a rendered artifact if the user's profile has not changed since it was built"""
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._lookup(self._artifacts, (user_id, name), self.version(user_id))
+        if entry is None:
+            return None
+        artifact = entry[2]
+        # File artifacts are only reusable while the file is still on disk
+        if isinstance(artifact, str) and name.endswith("_file") and not os.path.exists(artifact):
+            return None
+        return artifact
+
+    def put_artifact(self, user_id, name, artifact, version=None):
+        """Store a rendered artifact stamped with the version it was built from"""
+        user_id = str(user_id)
+        with self._lock:
+            current = self.version(user_id)
+            if version is not None and version != current:
+                return
+            self._insert(self._artifacts, (user_id, name),
+                         (current, time.monotonic() + self.ttl, artifact),
+                         self.max_artifacts)
+
+    def stats(self):
+        return {
+            "profiles": len(self._profiles),
+            "artifacts": len(self._artifacts),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,413 @@
+"""
+Incremental user profile statistics stored in MongoDB
+- Quiz ends are applied with one atomic update ($inc counters, $push/$slice history)
+- Per-day activity counters (period_stats.daily) feed the streaks; per-period
+  views (today, this week/month/year, time analytics) read stats_rollups
+- Only the last DAILY_STATS_DAYS days are kept; older days are folded into the
+  stored streak baseline and $unset by the quiz-end write
+- Averages, streaks, current-period stats and achievements are derived at read time
+- Profiles written by older versions are migrated once to the counter layout
+"""
+
+import datetime
+import logging
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Documents with this marker keep their statistics as server-side counters
+STATS_VERSION = 2
+
+# History kept in the profile documents
+RECENT_QUIZZES_LIMIT = 10
+RECENT_QUESTIONS_LIMIT = 10
+ACTIVITY_HISTORY_LIMIT = 50
+
+# Day key format, matching the keys process_quiz_end always used
+DAY_FORMAT = "%Y-%m-%d"
+
+# Day buckets kept in period_stats.daily; streaks carry on through the baseline
+DAILY_STATS_DAYS = 60
+
+QUIZ_COUNT_ACHIEVEMENTS = ((5, "5 Quizzes Completed"), (10, "10 Quizzes Completed"), (25, "25 Quizzes Completed"))
+STREAK_ACHIEVEMENTS = ((3, "3-Day Streak"), (7, "7-Day Streak"), (30, "30-Day Streak"))
+
+ACTIVITY_COUNT_ACHIEVEMENTS = (
+    (1, "first_quiz"), (5, "quiz_enthusiast"), (10, "quiz_master"),
+    (25, "quiz_quarter_century"), (50, "quiz_half_century"), (100, "quiz_century"),
+)
+ACTIVITY_STREAK_ACHIEVEMENTS = ((3, "consistency"), (7, "weekly_dedication"), (30, "monthly_dedication"))
+
+_indexed_collections = set()
+
+
+def field_key(name):
+    """Make a category name safe to use as a MongoDB field path segment"""
+    key = str(name or "General").replace(".", "·").strip()
+    return "_" + key[1:] if key.startswith("$") else key or "General"
+
+
+def ensure_profile_indexes(collection):
+    """Index profiles by user_id once per process so upserts cannot create duplicates"""
+    if collection is None or collection.full_name in _indexed_collections:
+        return
+    try:
+        collection.create_index("user_id", unique=True)
+    except Exception as e:
+        # Older data may already contain duplicate profiles; fall back to a plain index
+        logger.warning(f"Could not create unique user_id index on {collection.full_name}: {e}")
+        try:
+            collection.create_index("user_id")
+        except Exception as index_error:
+            logger.error(f"Could not index {collection.full_name}: {index_error}")
+    _indexed_collections.add(collection.full_name)
+
+
+def _apply_update(collection, user_id, update, migrate, streak_field, today):
+    """
+    Apply an update to a migrated profile in one round trip.
+    Profiles from before the counter layout are migrated first, and a
+    missing profile is created by the upsert.
+    """
+    user_id = str(user_id)
+    profile = collection.find_one_and_update(
+        {"user_id": user_id, "stats_version": STATS_VERSION}, update,
+        projection={"period_stats.daily": True, streak_field: True},
+        return_document=ReturnDocument.AFTER,
+    )
+    if profile is not None:
+        _prune_daily(collection, profile, streak_field, today)
+        return True
+
+    legacy = collection.find_one({"user_id": user_id})
+    if legacy is not None:
+        collection.update_one(
+            {"_id": legacy["_id"], "stats_version": {"$exists": False}},
+            {"$set": migrate(legacy)},
+        )
+    try:
+        collection.update_one({"user_id": user_id}, update, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent quiz end created the profile first
+        collection.update_one({"user_id": user_id}, update)
+    return True
+
+
+# ---------- streaks ----------
+
+def derive_streak(day_keys, baseline=None, today=None):
+    """
+    Compute {"current", "best", "last_quiz_date"} from the set of active days.
+    baseline carries the streak stored by older versions; the run that
+    contains its last day continues from its current value.
+    """
+    today = today or datetime.date.today()
+    baseline = baseline or {}
+    base_date = baseline.get("last_quiz_date")
+    days = set(day_keys)
+    if base_date:
+        days.add(base_date)
+    if not days:
+        return {"current": 0, "best": int(baseline.get("best", 0) or 0), "last_quiz_date": None}
+
+    dates = []
+    for key in days:
+        try:
+            dates.append(datetime.datetime.strptime(key, "%Y-%m-%d").date())
+        except (TypeError, ValueError):
+            continue
+    dates.sort()
+
+    base = None
+    if base_date:
+        try:
+            base = datetime.datetime.strptime(base_date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            base = None
+
+    best = int(baseline.get("best", 0) or 0)
+    run = 0
+    previous = None
+    for day in dates:
+        run = run + 1 if previous is not None and (day - previous).days == 1 else 1
+        if day == base:
+            run = max(run, int(baseline.get("current", 0) or 0))
+        best = max(best, run)
+        previous = day
+
+    current = run if (today - dates[-1]).days <= 1 else 0
+    return {"current": current, "best": best, "last_quiz_date": dates[-1].strftime("%Y-%m-%d")}
+
+
+def _active_days(period_stats):
+    return [day for day, bucket in (period_stats or {}).get("daily", {}).items()
+            if isinstance(bucket, dict) and bucket.get("quizzes", 0) > 0]
+
+
+def _prune_daily(collection, profile, streak_field, today):
+    """
+    Drop day buckets older than DAILY_STATS_DAYS, folding them into the streak
+    baseline first so the best streak, and a run still going, survive.
+    Rarely does anything: only when a day has fallen out of the window.
+    """
+    period_stats = profile.get("period_stats") or {}
+    cutoff = (today - datetime.timedelta(days=DAILY_STATS_DAYS)).strftime(DAY_FORMAT)
+    old = [day for day in period_stats.get("daily", {}) if day < cutoff]
+    if not old:
+        return
+    update = {"$unset": {f"period_stats.daily.{day}": "" for day in old}}
+    old_active = _active_days({"daily": {day: period_stats["daily"][day] for day in old}})
+    if old_active:
+        baseline = profile.get(streak_field) or {}
+        last = max(old_active + ([baseline["last_quiz_date"]] if baseline.get("last_quiz_date") else []))
+        try:
+            last_date = datetime.datetime.strptime(last, DAY_FORMAT).date()
+        except (TypeError, ValueError):
+            last_date = today
+        # "current" here is the run ending on the last folded day, as derive_streak expects
+        update["$set"] = {streak_field: derive_streak(old_active, baseline, last_date)}
+    try:
+        # Folding the same days twice gives the same baseline, so concurrent prunes agree
+        collection.update_one({"_id": profile["_id"]}, update)
+    except Exception as e:
+        logger.warning(f"Could not prune daily stats of profile {profile.get('_id')}: {e}")
+
+
+# ---------- detailed profiles (user_stats) ----------
+
+def build_quiz_end_update(user_id, user_name, quiz_id, category, total_questions, correct_answers,
+                          wrong_answers, percentage_score, recent_questions=None,
+                          is_premium=False, now=None):
+    """Build the single atomic update that records one finished quiz in a detailed profile"""
+    now = now or datetime.datetime.now()
+    category = field_key(category)
+    inc = {
+        "quizzes_taken": 1,
+        "total_questions": total_questions,
+        "total_correct": correct_answers,
+        "total_incorrect": wrong_answers,
+        "score_sum": percentage_score,
+        "scored_quizzes": 1,
+        f"categories.{category}.total": total_questions,
+        f"categories.{category}.correct": correct_answers,
+        f"categories.{category}.incorrect": wrong_answers,
+    }
+    today = now.strftime(DAY_FORMAT)
+    inc[f"period_stats.daily.{today}.quizzes"] = 1
+    inc[f"period_stats.daily.{today}.correct"] = correct_answers
+    inc[f"period_stats.daily.{today}.incorrect"] = wrong_answers
+
+    update_set = {
+        "premium_status": is_premium,
+        "last_updated": now.isoformat(),
+    }
+    if total_questions > 0 and correct_answers == total_questions:
+        update_set["achievements.Perfect Score"] = True
+
+    push = {
+        "recent_quizzes": {
+            "$each": [{
+                "quiz_id": quiz_id,
+                "date": now.isoformat(),
+                "score": percentage_score,
+                "correct": correct_answers,
+                "incorrect": wrong_answers,
+            }],
+            "$position": 0,
+            "$slice": RECENT_QUIZZES_LIMIT,
+        }
+    }
+    if recent_questions:
+        push["recent_questions"] = {
+            "$each": list(recent_questions),
+            "$position": 0,
+            "$slice": RECENT_QUESTIONS_LIMIT,
+        }
+
+    return {
+        "$inc": inc,
+        "$set": update_set,
+        "$push": push,
+        "$setOnInsert": {
+            "_id": f"profile_{user_id}_{int(now.timestamp())}",
+            "username": user_name,
+            "name": user_name,
+            "joined_date": now.isoformat(),
+            "created_at": now.isoformat(),
+            "stats_version": STATS_VERSION,
+        },
+    }
+
+
+def migrate_detailed_profile(profile):
+    """Fields that move an old read-modify-write profile to the counter layout"""
+    quizzes = int(profile.get("quizzes_taken", 0) or 0)
+    migrated = {
+        "stats_version": STATS_VERSION,
+        "score_sum": float(profile.get("avg_score", 0) or 0) * quizzes,
+        "scored_quizzes": quizzes,
+        "legacy_streaks": profile.get("streaks") or {},
+    }
+    period_stats = profile.get("period_stats") or {}
+    bucket = (profile.get("stats") or {}).get("daily") or {}
+    key = bucket.get("date")
+    if key and key not in period_stats.get("daily", {}):
+        period_stats.setdefault("daily", {})[key] = {
+            "quizzes": bucket.get("quizzes", 0),
+            "correct": bucket.get("correct", 0),
+            "incorrect": bucket.get("incorrect", 0),
+        }
+    migrated["period_stats"] = period_stats
+    return migrated
+
+
+def record_quiz_end(collection, user_id, user_name, quiz_id, category, total_questions,
+                    correct_answers, wrong_answers, percentage_score, recent_questions=None,
+                    is_premium=False, now=None):
+    """Record a finished quiz in the detailed profile with one atomic update"""
+    ensure_profile_indexes(collection)
+    now = now or datetime.datetime.now()
+    update = build_quiz_end_update(
+        user_id, user_name, quiz_id, category, total_questions, correct_answers,
+        wrong_answers, percentage_score, recent_questions, is_premium, now,
+    )
+    return _apply_update(collection, user_id, update, migrate_detailed_profile, "legacy_streaks", now.date())
+
+
+def derive_detailed_profile(profile, now=None):
+    """Fill in averages, streaks and achievements from stored counters"""
+    if not profile or profile.get("stats_version") != STATS_VERSION:
+        return profile
+    now = now or datetime.datetime.now()
+
+    scored = profile.get("scored_quizzes", 0)
+    profile["avg_score"] = profile.get("score_sum", 0) / scored if scored else 0
+
+    period_stats = profile.get("period_stats") or {}
+    streaks = derive_streak(_active_days(period_stats), profile.get("legacy_streaks"), now.date())
+    profile["streaks"] = streaks
+
+    achievements = dict(profile.get("achievements") or {})
+    quizzes = profile.get("quizzes_taken", 0)
+    if quizzes >= 1:
+        achievements.setdefault("First Quiz Completed", True)
+    for threshold, name in QUIZ_COUNT_ACHIEVEMENTS:
+        if quizzes >= threshold:
+            achievements[name] = True
+    for threshold, name in STREAK_ACHIEVEMENTS:
+        if streaks["best"] >= threshold:
+            achievements[name] = True
+    profile["achievements"] = achievements
+    return profile
+
+
+# ---------- activity profiles (user_profiles) ----------
+
+def build_activity_update(user_id, quiz_id, score, total_questions, correct_answers,
+                          incorrect_answers, quiz_title=None, category=None,
+                          is_premium=False, now=None):
+    """Build the single atomic update that records one finished quiz in an activity profile"""
+    now = now or datetime.datetime.now()
+    today = now.strftime(DAY_FORMAT)
+    inc = {
+        "total_quizzes": 1,
+        "total_questions_answered": total_questions,
+        "total_correct_answers": correct_answers,
+        "total_incorrect_answers": incorrect_answers,
+        f"period_stats.daily.{today}.quizzes": 1,
+        f"period_stats.daily.{today}.correct": correct_answers,
+        f"period_stats.daily.{today}.incorrect": incorrect_answers,
+    }
+    if category:
+        key = field_key(category)
+        inc[f"categories.{key}.quizzes_taken"] = 1
+        inc[f"categories.{key}.correct_answers"] = correct_answers
+        inc[f"categories.{key}.total_questions"] = total_questions
+
+    update = {
+        "$inc": inc,
+        "$set": {"is_premium": is_premium, "last_updated": now.isoformat()},
+        "$push": {
+            "quizzes_taken": {
+                "$each": [{
+                    "quiz_id": str(quiz_id),
+                    "title": quiz_title or f"Quiz {quiz_id}",
+                    "category": category,
+                    "score": score,
+                    "total_questions": total_questions,
+                    "correct_answers": correct_answers,
+                    "incorrect_answers": incorrect_answers,
+                    "score_percentage": (correct_answers / total_questions * 100) if total_questions > 0 else 0,
+                    "date": today,
+                    "timestamp": now.isoformat(),
+                }],
+                "$slice": -ACTIVITY_HISTORY_LIMIT,
+            }
+        },
+        "$setOnInsert": {
+            "_id": f"user_{user_id}_{int(now.timestamp())}",
+            "created_at": now.isoformat(),
+            "stats_version": STATS_VERSION,
+        },
+    }
+    if correct_answers == total_questions and total_questions >= 10:
+        update["$addToSet"] = {"achievements": "perfect_10"}
+    return update
+
+
+def migrate_activity_profile(profile):
+    """Fields that move an old read-modify-write activity profile to the counter layout"""
+    history = profile.get("quizzes_taken")
+    migrated = {
+        "stats_version": STATS_VERSION,
+        "legacy_streak": profile.get("streak") or {},
+    }
+    if isinstance(history, list) and len(history) > ACTIVITY_HISTORY_LIMIT:
+        migrated["quizzes_taken"] = sorted(history, key=lambda x: x.get("timestamp", ""))[-ACTIVITY_HISTORY_LIMIT:]
+    return migrated
+
+
+def record_quiz_activity(collection, user_id, quiz_id, score, total_questions, correct_answers,
+                         incorrect_answers, quiz_title=None, category=None, is_premium=False, now=None):
+    """Record a finished quiz in the activity profile with one atomic update"""
+    ensure_profile_indexes(collection)
+    now = now or datetime.datetime.now()
+    update = build_activity_update(
+        user_id, quiz_id, score, total_questions, correct_answers, incorrect_answers,
+        quiz_title, category, is_premium, now,
+    )
+    return _apply_update(collection, user_id, update, migrate_activity_profile, "legacy_streak", now.date())
+
+
+def derive_activity_profile(profile, now=None):
+    """Fill in averages, streak and achievements of an activity profile from stored counters"""
+    if not profile or profile.get("stats_version") != STATS_VERSION:
+        return profile
+    now = now or datetime.datetime.now()
+
+    total_questions = profile.get("total_questions_answered", 0)
+    profile["avg_score_percentage"] = (
+        profile.get("total_correct_answers", 0) / total_questions * 100 if total_questions > 0 else 0
+    )
+    for cat_stats in (profile.get("categories") or {}).values():
+        if isinstance(cat_stats, dict):
+            cat_total = cat_stats.get("total_questions", 0)
+            cat_stats["avg_score_percentage"] = (
+                cat_stats.get("correct_answers", 0) / cat_total * 100 if cat_total > 0 else 0
+            )
+
+    streak = derive_streak(_active_days(profile.get("period_stats")), profile.get("legacy_streak"), now.date())
+    profile["streak"] = streak
+
+    achievements = list(profile.get("achievements") or [])
+    quizzes = profile.get("total_quizzes", 0)
+    for threshold, name in ACTIVITY_COUNT_ACHIEVEMENTS:
+        if quizzes >= threshold and name not in achievements:
+            achievements.append(name)
+    for threshold, name in ACTIVITY_STREAK_ACHIEVEMENTS:
+        if streak["best"] >= threshold and name not in achievements:
+            achievements.append(name)
+    profile["achievements"] = achievements
+    return profile
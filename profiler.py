@@ -0,0 +1,183 @@
+"""
+On-demand profiling of the running bot
+- CPU: a sampling profiler thread reads every thread's stack with
+  sys._current_frames() at a fixed rate; nothing is traced, so the cost is
+  bounded by the sample rate whatever the bot is doing
+- Allocations: tracemalloc snapshots at the start and end of the window,
+  diffed by traceback
+- Output in collapsed-stack format ("frame;frame;frame weight" per line), ready
+  for flamegraph.pl or speedscope, plus a plain-text top-N summary
+- One session at a time; durations and sample rates are capped
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+MODE_CPU = "cpu"
+MODE_ALLOC = "alloc"
+MODES = (MODE_CPU, MODE_ALLOC)
+
+MAX_SECONDS = 120
+DEFAULT_SECONDS = 30
+
+# 200 samples per second at most
+SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_STACK_DEPTH = 64
+
+# tracemalloc slows every allocation; keep tracebacks short
+ALLOC_TRACEBACK_FRAMES = 16
+
+TOP_N = 30
+
+_session_lock = threading.Lock()
+
+# Leave out the profiler's own bookkeeping
+_ALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+)
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is already running"""
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads every interval seconds"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS):
+        self.interval = max(interval, SAMPLE_INTERVAL_SECONDS)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_names = {}
+
+    def _thread_name(self, ident):
+        name = self._thread_names.get(ident)
+        if name is None:
+            for thread in threading.enumerate():
+                self._thread_names[thread.ident] = thread.name
+            name = self._thread_names.get(ident, f"thread-{ident}")
+        return name
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(self._thread_name(ident))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def collapsed_text(stacks):
+    """Collapsed-stack lines, heaviest first"""
+    return "".join(f"{stack} {weight}\n" for stack, weight in stacks.most_common() if weight > 0)
+
+
+def cpu_summary(stacks, samples, seconds, top_n=TOP_N):
+    """Top functions by self and inclusive samples"""
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    total = sum(stacks.values()) or 1
+    lines = [
+        f"CPU profile: {seconds}s, {samples} sampling rounds, {total} thread samples",
+        "Idle threads (waiting in select/sleep/lock acquire) appear as samples too.",
+        "",
+        f"Top {top_n} by self samples:",
+    ]
+    lines += [f"{count:8d} {count / total:6.1%}  {frame}" for frame, count in own.most_common(top_n)]
+    lines += ["", f"Top {top_n} by inclusive samples:"]
+    lines += [f"{count:8d} {count / total:6.1%}  {frame}" for frame, count in inclusive.most_common(top_n)]
+    return "\n".join(lines) + "\n"
+
+
+def _alloc_stacks(diff):
+    stacks = Counter()
+    for stat in diff:
+        if stat.size_diff <= 0:
+            continue
+        labels = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+        # tracemalloc lists the most recent frame first
+        stacks[";".join(reversed(labels))] += stat.size_diff
+    return stacks
+
+
+def alloc_summary(diff, seconds, top_n=TOP_N):
+    """Top allocation sites by net growth over the window, from a per-line snapshot diff"""
+    growth = [stat for stat in diff if stat.size_diff > 0]
+    growth.sort(key=lambda stat: stat.size_diff, reverse=True)
+    total = sum(stat.size_diff for stat in growth)
+    lines = [f"Allocation profile: {seconds}s, net growth {total / 1024:.1f} KiB", "", f"Top {top_n} sites:"]
+    for stat in growth[:top_n]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:10.1f} KiB {stat.count_diff:+8d} blocks  "
+                     f"{os.path.basename(frame.filename)}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+async def run_profile(mode, seconds):
+    """
+    Profile the whole process for seconds and return (collapsed stacks, summary).
+    Raises ProfilerBusy if another session is running.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    seconds = max(1, min(int(seconds), MAX_SECONDS))
+    if not _session_lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        if mode == MODE_CPU:
+            profiler = SamplingProfiler()
+            profiler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.stop()
+            return collapsed_text(profiler.stacks), cpu_summary(profiler.stacks, profiler.samples, seconds)
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(ALLOC_TRACEBACK_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(_ALLOC_FILTERS)
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot().filter_traces(_ALLOC_FILTERS)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        # Diffing walks every traced block; keep it off the event loop
+        by_traceback = await asyncio.to_thread(after.compare_to, before, "traceback")
+        by_line = await asyncio.to_thread(after.compare_to, before, "lineno")
+        return collapsed_text(_alloc_stacks(by_traceback)), alloc_summary(by_line, seconds)
+    finally:
+        _session_lock.release()
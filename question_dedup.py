@@ -0,0 +1,518 @@
+"""
+Near-duplicate question detection for the Telegram Quiz Bot
+- Normalises Hindi (Devanagari) and English question text
+- Fingerprints every stored question with a 64-bit SimHash
+- Finds near-duplicates through banded lookup tables instead of a full scan
+- Reports duplicate clusters across the whole question bank
+- Shared by the worker processes as a snapshot plus an append-only journal:
+  saved questions and deleted quizzes are appended under a lock, every worker
+  tails the journal, and a long journal is compacted into a new snapshot
+- Questions are only indexed once they are saved (record_questions)
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import hashlib
+import threading
+import time
+import unicodedata
+
+from sharding import file_lock, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# File used to persist fingerprints between restarts; changes since it was written
+# go to an append-only journal next to it (question_fingerprints.<generation>.journal)
+DEDUP_INDEX_FILE = "question_fingerprints.json"
+
+# The journal is folded into a new snapshot once it holds this many changes
+COMPACT_AFTER_ENTRIES = 5000
+
+# Two questions whose fingerprints differ in at most this many bits are duplicates
+MAX_HAMMING_DISTANCE = 3
+
+# 64-bit fingerprints are split into 4 bands of 16 bits. By the pigeonhole
+# principle two fingerprints within 3 bits of each other share at least one band.
+FINGERPRINT_BITS = 64
+BAND_COUNT = MAX_HAMMING_DISTANCE + 1
+BAND_BITS = FINGERPRINT_BITS // BAND_COUNT
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Leading numbering such as "Q1.", "Q.12)", "15.", "प्रश्न 3:" is not part of the question
+QUESTION_PREFIX_PATTERN = re.compile(r'^\s*(?:q(?:uestion)?|प्रश्न|प्र)?\s*[\.\:\-]?\s*\d*\s*[\.\:\)\-]\s*', re.IGNORECASE)
+
+
+def normalize_question_text(text):
+    """Normalise question text so formatting differences do not hide duplicates"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    text = QUESTION_PREFIX_PATTERN.sub("", text, count=1)
+    # Keep letters, combining marks (Devanagari matras) and digits, drop everything else
+    cleaned = []
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category[0] in ("L", "M", "N"):
+            cleaned.append(ch)
+        else:
+            cleaned.append(" ")
+    return " ".join("".join(cleaned).split())
+
+
+def _question_features(question):
+    """Build the weighted feature list used for fingerprinting a question"""
+    text = normalize_question_text(question.get("question", ""))
+    words = text.split()
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+    # Options are order-independent: a shuffled copy is still the same question
+    options = question.get("options") or []
+    for option in options:
+        option_text = normalize_question_text(option)
+        if option_text:
+            features.append(f"opt:{option_text}")
+    return features
+
+
+def _feature_hash(feature):
+    """Stable 64-bit hash of a feature (the builtin hash() is randomised per process)"""
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Each fingerprint bit gets its own 16-bit counter lane inside one big integer,
+# so summing the per-bit votes of a feature is a single addition
+_LANE_BITS = 16
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_SPREAD_BYTE = [
+    sum(((value >> bit) & 1) << (bit * _LANE_BITS) for bit in range(8))
+    for value in range(256)
+]
+
+
+def _spread_bits(h):
+    """Spread the 64 bits of h into 64 counter lanes"""
+    spread = 0
+    for i in range(FINGERPRINT_BITS // 8):
+        spread |= _SPREAD_BYTE[(h >> (i * 8)) & 0xFF] << (i * 8 * _LANE_BITS)
+    return spread
+
+
+def simhash_question(question):
+    """Return the 64-bit SimHash fingerprint of a question dict, or None if it has no text"""
+    features = _question_features(question)
+    if not features:
+        return None
+
+    votes = 0
+    for feature in features:
+        votes += _spread_bits(_feature_hash(feature))
+
+    # A bit is set when more than half of the features voted for it
+    fingerprint = 0
+    total = len(features)
+    for bit in range(FINGERPRINT_BITS):
+        if ((votes >> (bit * _LANE_BITS)) & _LANE_MASK) * 2 > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count("1")
+
+
+def _bands(fingerprint):
+    """Split a fingerprint into its band keys"""
+    return [(band, (fingerprint >> (band * BAND_BITS)) & BAND_MASK) for band in range(BAND_COUNT)]
+
+
+class QuestionDedupIndex:
+    """In-memory SimHash index over every stored question"""
+
+    def __init__(self):
+        # entry key "quiz_id#position" -> {"fp": int, "quiz_id": str, "preview": str}
+        self.entries = {}
+        # quiz_id -> list of entry keys, used for removal and positions
+        self.quiz_entries = {}
+        # (band, band_value) -> set of entry keys
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add_entry(self, quiz_id, fingerprint, preview):
+        quiz_id = str(quiz_id)
+        keys = self.quiz_entries.setdefault(quiz_id, [])
+        key = f"{quiz_id}#{len(keys)}"
+        keys.append(key)
+        self.entries[key] = {"fp": fingerprint, "quiz_id": quiz_id, "preview": preview}
+        for band_key in _bands(fingerprint):
+            self.buckets.setdefault(band_key, set()).add(key)
+        return key
+
+    def find_matches(self, question, fingerprint=None):
+        """Return the stored entries that are near-duplicates of a question"""
+        if fingerprint is None:
+            fingerprint = simhash_question(question)
+        if fingerprint is None:
+            return []
+
+        candidates = set()
+        for band_key in _bands(fingerprint):
+            candidates.update(self.buckets.get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            entry = self.entries[key]
+            distance = hamming_distance(fingerprint, entry["fp"])
+            if distance <= MAX_HAMMING_DISTANCE:
+                matches.append({"key": key, "quiz_id": entry["quiz_id"],
+                                "preview": entry["preview"], "distance": distance})
+        matches.sort(key=lambda m: m["distance"])
+        return matches
+
+    def add_question(self, quiz_id, question):
+        """Index one question and return the near-duplicates it had before being added"""
+        fingerprint = simhash_question(question)
+        if fingerprint is None:
+            return []
+        matches = self.find_matches(question, fingerprint)
+        preview = str(question.get("question", "")).strip()[:80]
+        self._add_entry(quiz_id, fingerprint, preview)
+        return matches
+
+    def remove_quiz(self, quiz_id):
+        """Forget every question stored under a quiz ID"""
+        for key in self.quiz_entries.pop(str(quiz_id), []):
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                continue
+            for band_key in _bands(entry["fp"]):
+                bucket = self.buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self.buckets[band_key]
+
+    def clusters(self, min_size=2):
+        """Group the whole bank into clusters of near-duplicate questions"""
+        parent = {}
+
+        def find(key):
+            while parent.get(key, key) != key:
+                parent[key] = parent.get(parent[key], parent[key])
+                key = parent[key]
+            return key
+
+        # Only entries that share a bucket can be duplicates, so pairs are
+        # generated per bucket rather than across the whole bank
+        for bucket in self.buckets.values():
+            if len(bucket) < 2:
+                continue
+            keys = list(bucket)
+            for i, a in enumerate(keys):
+                fp_a = self.entries[a]["fp"]
+                for b in keys[i + 1:]:
+                    if hamming_distance(fp_a, self.entries[b]["fp"]) <= MAX_HAMMING_DISTANCE:
+                        parent.setdefault(a, a)
+                        parent.setdefault(b, b)
+                        root_a, root_b = find(a), find(b)
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+
+        groups = {}
+        for key in parent:
+            groups.setdefault(find(key), []).append(key)
+
+        result = []
+        for keys in groups.values():
+            if len(keys) >= min_size:
+                result.append([dict(self.entries[k], key=k) for k in sorted(keys)])
+        result.sort(key=len, reverse=True)
+        return result
+
+    def to_dict(self):
+        return {
+            "version": 1,
+            "quizzes": {
+                quiz_id: [[format(self.entries[k]["fp"], "016x"), self.entries[k]["preview"]] for k in keys]
+                for quiz_id, keys in self.quiz_entries.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        for quiz_id, items in data.get("quizzes", {}).items():
+            for fp_hex, preview in items:
+                index._add_entry(quiz_id, int(fp_hex, 16), preview)
+        return index
+
+    @classmethod
+    def from_questions(cls, all_questions):
+        """Build an index from the {quiz_id: [questions]} structure used by questions.json"""
+        index = cls()
+        for quiz_id, questions in (all_questions or {}).items():
+            if not isinstance(questions, list):
+                questions = [questions]
+            for question in questions:
+                if not isinstance(question, dict):
+                    continue
+                fingerprint = simhash_question(question)
+                if fingerprint is not None:
+                    index._add_entry(quiz_id, fingerprint, str(question.get("question", "")).strip()[:80])
+        return index
+
+
+# Lazily created module-level index shared by every import path, and the snapshot
+# and journal position it reflects
+_dedup_index = None
+_snapshot_version = None
+_generation = None
+_journal_offset = 0
+_journal_entries = 0
+# Guards the in-memory index: handlers check it on the loop and update it from worker threads
+_index_lock = threading.RLock()
+
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def _journal_file(generation):
+    return f"{os.path.splitext(DEDUP_INDEX_FILE)[0]}.{generation}.journal"
+
+
+def _apply(index, record):
+    if record.get("op") == "remove":
+        index.remove_quiz(record["quiz_id"])
+    else:
+        index._add_entry(record["quiz_id"], int(record["fp"], 16), record.get("preview", ""))
+
+
+def _tail_journal():
+    """Apply the journal lines other workers appended since we last looked"""
+    global _journal_offset, _journal_entries
+    try:
+        with open(_journal_file(_generation), 'rb') as f:
+            f.seek(_journal_offset)
+            data = f.read()
+    except FileNotFoundError:
+        return
+    # A line still being written has no newline yet; it is picked up next time
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines():
+        if line.strip():
+            _apply(_dedup_index, json.loads(line))
+            _journal_entries += 1
+    _journal_offset += end
+
+
+def _load_snapshot():
+    """Load the snapshot and replay its journal; False if there is no snapshot"""
+    global _dedup_index, _snapshot_version, _generation, _journal_offset, _journal_entries
+    try:
+        f = open(DEDUP_INDEX_FILE, 'r')
+    except FileNotFoundError:
+        return False
+    with f:
+        stat = os.fstat(f.fileno())
+        data = json.load(f)
+    _dedup_index = QuestionDedupIndex.from_dict(data)
+    _snapshot_version = (stat.st_mtime_ns, stat.st_size)
+    _generation = data.get("generation", 0)
+    _journal_offset = _journal_entries = 0
+    _tail_journal()
+    logger.info(f"Loaded {len(_dedup_index)} question fingerprints")
+    return True
+
+
+def _write_snapshot(index):
+    """
+    Write the whole index as a new snapshot with an empty journal and drop the
+    old journals. Callers hold file_lock(DEDUP_INDEX_FILE).
+    """
+    global _dedup_index, _snapshot_version, _generation, _journal_offset, _journal_entries
+    generation = format(time.time_ns(), "x")
+    data = index.to_dict()
+    data["generation"] = generation
+    write_json_atomic(DEDUP_INDEX_FILE, data, ensure_ascii=False)
+    _dedup_index = index
+    _snapshot_version = _file_version(DEDUP_INDEX_FILE)
+    _generation = generation
+    _journal_offset = _journal_entries = 0
+    current = _journal_file(generation)
+    for path in glob.glob(f"{glob.escape(os.path.splitext(DEDUP_INDEX_FILE)[0])}.*.journal"):
+        if path != current:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _sync(load_questions_func=None, locked=False):
+    """
+    Bring the in-memory index up to date with the files: reload after another
+    worker wrote a snapshot, else read new journal lines. With no snapshot at
+    all the index is built from the question bank. Callers hold _index_lock.
+    """
+    if _dedup_index is not None and _file_version(DEDUP_INDEX_FILE) in (_snapshot_version, None):
+        _tail_journal()
+        return _dedup_index
+    try:
+        if _load_snapshot():
+            return _dedup_index
+    except Exception as e:
+        logger.error(f"Error loading question fingerprint index, rebuilding: {e}")
+    if locked:
+        return _rebuild(load_questions_func)
+    with file_lock(DEDUP_INDEX_FILE):
+        return _rebuild(load_questions_func)
+
+
+def _rebuild(load_questions_func):
+    global _dedup_index
+    all_questions = load_questions_func() if load_questions_func else {}
+    index = QuestionDedupIndex.from_questions(all_questions)
+    logger.info(f"Built question fingerprint index with {len(index)} questions")
+    try:
+        _write_snapshot(index)
+    except Exception as e:
+        logger.error(f"Error saving question fingerprint index: {e}")
+        _dedup_index = index
+    return index
+
+
+def _record(records, load_questions_func=None):
+    """Apply index changes here and append them to the journal the other workers tail"""
+    global _journal_offset, _journal_entries
+    # Nothing built yet: the first build reads the saved bank, changes included
+    if not records or (_dedup_index is None and _file_version(DEDUP_INDEX_FILE) is None):
+        return
+    with _index_lock, file_lock(DEDUP_INDEX_FILE):
+        # Catch up first so our offset stays at the end of the journal
+        index = _sync(load_questions_func, locked=True)
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        try:
+            with open(_journal_file(_generation), 'ab') as f:
+                f.write(payload)
+        except OSError as e:
+            logger.error(f"Error writing question fingerprint journal: {e}")
+        else:
+            _journal_offset += len(payload)
+            _journal_entries += len(records)
+        for record in records:
+            _apply(index, record)
+        if _journal_entries >= COMPACT_AFTER_ENTRIES:
+            try:
+                _write_snapshot(index)
+            except Exception as e:
+                logger.error(f"Error compacting question fingerprint index: {e}")
+
+
+def _add_records(quiz_id, questions):
+    records = []
+    for question in questions or []:
+        if not isinstance(question, dict):
+            continue
+        fingerprint = simhash_question(question)
+        if fingerprint is not None:
+            records.append({"quiz_id": str(quiz_id), "fp": format(fingerprint, "016x"),
+                            "preview": str(question.get("question", "")).strip()[:80]})
+    return records
+
+
+def save_dedup_index():
+    """Write the whole index as a fresh snapshot (compacting the journal)"""
+    if _dedup_index is None:
+        return False
+    try:
+        with _index_lock, file_lock(DEDUP_INDEX_FILE):
+            _write_snapshot(_sync(locked=True))
+        return True
+    except Exception as e:
+        logger.error(f"Error saving question fingerprint index: {e}")
+        return False
+
+
+def get_dedup_index(load_questions_func=None):
+    """
+    Return the shared index, loading it from disk or building it from the question bank.
+    Picks up what other workers recorded since the last call.
+    """
+    with _index_lock:
+        return _sync(load_questions_func)
+
+
+def rebuild_dedup_index(load_questions_func=None):
+    """Rebuild the index from scratch from the full question bank"""
+    with _index_lock, file_lock(DEDUP_INDEX_FILE):
+        return _rebuild(load_questions_func)
+
+
+def filter_duplicate_questions(quiz_id, questions, load_questions_func=None, drop=True, index=None, staged=None):
+    """
+    Check incoming questions against the bank; nothing is indexed here.
+
+    Duplicates of a question already in the same quiz (or earlier in the same
+    batch) are dropped when drop is True. Matches in other quizzes are only
+    flagged, since reusing a question in a different quiz is legitimate.
+
+    Returns (kept_questions, dropped_questions, flagged) where flagged is a list
+    of (question, matches) pairs for cross-quiz duplicates. Once the kept
+    questions are saved, pass them to record_questions(). index replaces the
+    shared index (e.g. a private one for a dry run); staged holds questions
+    accepted but not saved yet, and the kept ones are added to it.
+    """
+    quiz_id = str(quiz_id)
+    staged = staged if staged is not None else QuestionDedupIndex()
+    kept, dropped, flagged = [], [], []
+
+    with _index_lock:
+        if index is None:
+            index = _sync(load_questions_func)
+        for question in questions:
+            if not isinstance(question, dict):
+                continue
+            fingerprint = simhash_question(question)
+            if fingerprint is None:
+                kept.append(question)
+                continue
+
+            matches = index.find_matches(question, fingerprint) + staged.find_matches(question, fingerprint)
+            same_quiz = [m for m in matches if m["quiz_id"] == quiz_id]
+            if same_quiz and drop:
+                dropped.append(question)
+                continue
+            if matches:
+                flagged.append((question, matches))
+
+            staged._add_entry(quiz_id, fingerprint, str(question.get("question", "")).strip()[:80])
+            kept.append(question)
+
+    if dropped or flagged:
+        logger.info(f"Dedup for quiz {quiz_id}: kept {len(kept)}, dropped {len(dropped)}, flagged {len(flagged)}")
+    return kept, dropped, flagged
+
+
+def record_questions(quiz_id, questions, load_questions_func=None):
+    """Index questions once they are saved under a quiz ID"""
+    _record(_add_records(quiz_id, questions), load_questions_func)
+
+
+def index_quiz_questions(quiz_id, questions, load_questions_func=None):
+    """Replace the indexed questions of a quiz with the given list"""
+    _record([{"op": "remove", "quiz_id": str(quiz_id)}] + _add_records(quiz_id, questions), load_questions_func)
+
+
+def remove_quiz_from_dedup_index(quiz_id):
+    """Drop a deleted quiz from the index"""
+    _record([{"op": "remove", "quiz_id": str(quiz_id)}])
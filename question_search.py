@@ -0,0 +1,262 @@
+"""
+Full-text question search for the Telegram Quiz Bot
+- Devanagari-aware tokenisation of question text and options
+- Compact inverted index (term -> array of question numbers)
+- BM25 ranking of questions, grouped into ranked quiz IDs with snippets
+- Kept in step with the question bank by reindexing only quizzes whose content
+  changed (per-quiz hash of question text and options); appends are indexed
+  without re-tokenising the questions already there
+"""
+
+import hashlib
+import logging
+import math
+import time
+import unicodedata
+from array import array
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Compact the postings once this share of indexed questions has been deleted
+COMPACT_RATIO = 0.25
+
+# Resync with storage at least this often to pick up MongoDB-side changes
+SEARCH_REFRESH_SECONDS = 300
+
+SNIPPET_LENGTH = 90
+
+# Very common English and Hindi words that carry no search value
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "by", "and", "or", "is", "are",
+    "was", "were", "be", "which", "what", "who", "whom", "when", "where", "how", "following",
+    "its", "it", "this", "that", "with", "as", "from",
+    "का", "की", "के", "को", "में", "से", "है", "हैं", "था", "थे", "थी", "और", "या", "पर",
+    "एक", "यह", "वह", "ने", "भी", "तो", "क्या", "कौन", "कौनसा", "कौनसी", "किस", "किसे",
+    "निम्न", "निम्नलिखित", "द्वारा",
+}
+
+
+def tokenize(text):
+    """
+    Split text into search terms.
+    Letters, combining marks and digits stay together, so Devanagari vowel
+    signs and viramas remain part of their word instead of splitting it.
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    terms = []
+    current = []
+    for ch in text:
+        if unicodedata.category(ch)[0] in ("L", "M", "N"):
+            current.append(ch)
+        elif current:
+            terms.append("".join(current))
+            current = []
+    if current:
+        terms.append("".join(current))
+    return [t for t in terms if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def _content_hash(questions, hasher=None):
+    """Running hash of the searchable content (question text and options) of a question list"""
+    hasher = hasher or hashlib.blake2b(digest_size=16)
+    for question in questions:
+        if isinstance(question, dict):
+            hasher.update(str(question.get("question", "")).encode("utf-8", "replace"))
+            for option in question.get("options") or []:
+                hasher.update(b"\x1f" + str(option).encode("utf-8", "replace"))
+        hasher.update(b"\x1e")
+    return hasher
+
+
+def _question_terms(question):
+    terms = tokenize(question.get("question", ""))
+    for option in question.get("options") or []:
+        terms.extend(tokenize(option))
+    return terms
+
+
+class QuestionSearchIndex:
+    """Inverted index over question text and options"""
+
+    def __init__(self):
+        self.postings = {}       # term -> array('I') of doc numbers (repeated for term frequency)
+        self.doc_quiz = []       # doc number -> quiz_id
+        self.doc_length = array('I')
+        self.doc_snippet = []    # doc number -> short question text
+        self.quiz_docs = {}      # quiz_id -> list of doc numbers
+        self.quiz_content = {}   # quiz_id -> (questions seen, running content hash)
+        self.deleted = set()
+        self.total_length = 0
+        self.built_at = 0.0
+        self.synced_at = 0.0
+        self.source_version = None  # Version of the question bank file it reflects (set by the owner)
+
+    def __len__(self):
+        return len(self.doc_quiz) - len(self.deleted)
+
+    @property
+    def is_stale(self):
+        return not self.synced_at or time.monotonic() - self.synced_at > SEARCH_REFRESH_SECONDS
+
+    def _add_doc(self, quiz_id, question):
+        terms = _question_terms(question)
+        doc = len(self.doc_quiz)
+        self.doc_quiz.append(quiz_id)
+        self.doc_length.append(len(terms))
+        self.doc_snippet.append(" ".join(str(question.get("question", "")).split())[:SNIPPET_LENGTH])
+        self.total_length += len(terms)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array('I')
+            postings.append(doc)
+        return doc
+
+    def add_questions(self, quiz_id, questions):
+        """Append questions to a quiz in the index"""
+        quiz_id = str(quiz_id)
+        questions = questions or []
+        docs = self.quiz_docs.setdefault(quiz_id, [])
+        for question in questions:
+            if isinstance(question, dict):
+                docs.append(self._add_doc(quiz_id, question))
+        seen, hasher = self.quiz_content.get(quiz_id, (0, None))
+        self.quiz_content[quiz_id] = (seen + len(questions), _content_hash(questions, hasher))
+
+    def remove_quiz(self, quiz_id):
+        """Remove every question of a quiz from the index"""
+        self.quiz_content.pop(str(quiz_id), None)
+        for doc in self.quiz_docs.pop(str(quiz_id), []):
+            self.deleted.add(doc)
+            self.total_length -= self.doc_length[doc]
+        if self.doc_quiz and len(self.deleted) > COMPACT_RATIO * len(self.doc_quiz):
+            self.compact()
+
+    def index_quiz(self, quiz_id, questions):
+        """Replace the indexed questions of a quiz"""
+        self.remove_quiz(quiz_id)
+        self.add_questions(quiz_id, questions)
+
+    def indexed_count(self, quiz_id):
+        return len(self.quiz_docs.get(str(quiz_id), ()))
+
+    def sync(self, all_questions):
+        """
+        Reindex quizzes whose content changed and drop deleted quizzes.
+        A quiz whose indexed questions are unchanged only gets its new
+        questions appended; an edit or a same-size replacement changes the
+        content hash and reindexes that quiz.
+        """
+        seen = set()
+        for quiz_id, questions in (all_questions or {}).items():
+            quiz_id = str(quiz_id)
+            seen.add(quiz_id)
+            if not isinstance(questions, list):
+                questions = [questions]
+            indexed, hasher = self.quiz_content.get(quiz_id, (0, None))
+            if (hasher is not None and indexed <= len(questions)
+                    and _content_hash(questions[:indexed]).digest() == hasher.digest()):
+                if indexed < len(questions):
+                    self.add_questions(quiz_id, questions[indexed:])
+                continue
+            self.index_quiz(quiz_id, questions)
+        for quiz_id in [q for q in self.quiz_docs if q not in seen]:
+            self.remove_quiz(quiz_id)
+        self.synced_at = time.monotonic()
+
+    def compact(self):
+        """Rebuild postings without deleted questions"""
+        if not self.deleted:
+            return
+        remap = {}
+        doc_quiz, doc_length, doc_snippet = [], array('I'), []
+        for doc, quiz_id in enumerate(self.doc_quiz):
+            if doc in self.deleted:
+                continue
+            remap[doc] = len(doc_quiz)
+            doc_quiz.append(quiz_id)
+            doc_length.append(self.doc_length[doc])
+            doc_snippet.append(self.doc_snippet[doc])
+
+        postings = {}
+        for term, docs in self.postings.items():
+            kept = array('I', (remap[d] for d in docs if d in remap))
+            if kept:
+                postings[term] = kept
+
+        self.postings = postings
+        self.doc_quiz, self.doc_length, self.doc_snippet = doc_quiz, doc_length, doc_snippet
+        self.quiz_docs = {q: [remap[d] for d in docs] for q, docs in self.quiz_docs.items()}
+        self.deleted = set()
+        logger.info(f"Compacted question search index to {len(doc_quiz)} questions")
+
+    def rebuild(self, all_questions):
+        """Index the whole {quiz_id: [questions]} bank from scratch"""
+        self.__init__()
+        for quiz_id, questions in (all_questions or {}).items():
+            if not isinstance(questions, list):
+                questions = [questions]
+            self.add_questions(quiz_id, questions)
+        self.built_at = self.synced_at = time.monotonic()
+        logger.info(f"Question search index built with {len(self)} questions and {len(self.postings)} terms")
+
+    def search(self, query, limit=10):
+        """
+        Rank quizzes for a query.
+        Returns a list of dicts with quiz_id, score, matches (matching question
+        count) and snippet (best matching question), best first.
+        """
+        terms = tokenize(query)
+        live_docs = len(self)
+        if not terms or not live_docs:
+            return []
+
+        avg_length = max(self.total_length / live_docs, 1)
+        scores = {}
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            frequencies = Counter(postings)
+            df = len(frequencies)
+            idf = math.log(1 + (live_docs - df + 0.5) / (df + 0.5))
+            for doc, tf in frequencies.items():
+                if doc in self.deleted:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_length[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        # Group question scores by quiz: the best question decides the rank,
+        # further matching questions add a small bonus
+        quizzes = {}
+        for doc, score in scores.items():
+            quiz_id = self.doc_quiz[doc]
+            entry = quizzes.get(quiz_id)
+            if entry is None:
+                quizzes[quiz_id] = {"quiz_id": quiz_id, "best": score, "doc": doc, "matches": 1}
+            else:
+                entry["matches"] += 1
+                if score > entry["best"]:
+                    entry["best"], entry["doc"] = score, doc
+
+        ranked = sorted(
+            quizzes.values(),
+            key=lambda e: e["best"] + 0.1 * math.log(e["matches"]),
+            reverse=True,
+        )[:limit]
+        return [
+            {
+                "quiz_id": e["quiz_id"],
+                "score": round(e["best"], 3),
+                "matches": e["matches"],
+                "snippet": self.doc_snippet[e["doc"]],
+            }
+            for e in ranked
+        ]
@@ -0,0 +1,130 @@
+"""
+Per-question answer analytics
+- Every question gets a stable key derived from its normalised text and options
+- poll_answer bumps a compact counter array per question while the quiz runs:
+  [attempts, correct, option 0 picks, option 1 picks, ...]
+- end_quiz adds the arrays to MongoDB with one bulk_write of $inc upserts
+- Reports read difficulty and option distributions from the stored counters
+"""
+
+import hashlib
+import logging
+
+from pymongo import ASCENDING, UpdateOne
+
+from question_dedup import normalize_question_text
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS = 0
+CORRECT = 1
+FIRST_OPTION = 2
+
+# Accuracy thresholds (percent) for the difficulty badges
+EASY_ACCURACY = 75
+HARD_ACCURACY = 40
+
+_indexed_collections = set()
+
+
+def question_key(question):
+    """Stable id of a question: the same text and options always give the same key"""
+    text = normalize_question_text(question.get("question") or question.get("text") or "")
+    options = [normalize_question_text(option) for option in question.get("options") or []]
+    digest = hashlib.sha1("\x1f".join([text] + options).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+def record_answer(counters, key, option_count, option_id, is_correct):
+    """Add one answer to the quiz's counter arrays (counters: {key: [attempts, correct, *options]})"""
+    row = counters.get(key)
+    if row is None:
+        row = counters[key] = [0] * (FIRST_OPTION + option_count)
+    row[ATTEMPTS] += 1
+    if is_correct:
+        row[CORRECT] += 1
+    if option_id is not None and 0 <= option_id < option_count:
+        row[FIRST_OPTION + option_id] += 1
+
+
+def ensure_question_stats_indexes(collection):
+    if collection is None or collection.full_name in _indexed_collections:
+        return
+    try:
+        collection.create_index([("quiz_ids", ASCENDING)])
+    except Exception as e:
+        logger.error(f"Could not index {collection.full_name}: {e}")
+    _indexed_collections.add(collection.full_name)
+
+
+def persist_question_stats(collection, quiz_id, questions, counters):
+    """Add a finished quiz's counters to the stored per-question totals"""
+    if collection is None or not counters:
+        return 0
+    ensure_question_stats_indexes(collection)
+    by_key = {question_key(question): question for question in questions}
+    operations = []
+    for key, row in counters.items():
+        question = by_key.get(key, {})
+        increments = {"attempts": row[ATTEMPTS], "correct": row[CORRECT]}
+        for option_id, picks in enumerate(row[FIRST_OPTION:]):
+            if picks:
+                increments[f"options.{option_id}"] = picks
+        update = {
+            "$inc": increments,
+            "$set": {
+                "preview": str(question.get("question") or question.get("text") or "")[:120],
+                "option_count": len(row) - FIRST_OPTION,
+                "answer": question.get("answer", 0),
+            },
+        }
+        if quiz_id:
+            update["$addToSet"] = {"quiz_ids": str(quiz_id)}
+        operations.append(UpdateOne({"_id": key}, update, upsert=True))
+    collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def _entry(doc):
+    option_count = doc.get("option_count", 0)
+    options = doc.get("options", {})
+    attempts = doc.get("attempts", 0)
+    correct = doc.get("correct", 0)
+    accuracy = correct / attempts * 100 if attempts else None
+    return {
+        "key": doc["_id"],
+        "preview": doc.get("preview", ""),
+        "answer": doc.get("answer", 0),
+        "attempts": attempts,
+        "correct": correct,
+        "options": [options.get(str(i), 0) for i in range(option_count)],
+        "accuracy": accuracy,
+        "difficulty": difficulty_label(accuracy),
+    }
+
+
+def difficulty_label(accuracy):
+    """Easy / Medium / Hard from an accuracy percentage, None when nobody answered"""
+    if accuracy is None:
+        return None
+    if accuracy >= EASY_ACCURACY:
+        return "Easy"
+    if accuracy < HARD_ACCURACY:
+        return "Hard"
+    return "Medium"
+
+
+def load_question_stats(collection, questions):
+    """Stored stats aligned with a list of questions (None where a question has none)"""
+    if collection is None or not questions:
+        return [None] * len(questions or [])
+    keys = [question_key(question) for question in questions]
+    docs = {doc["_id"]: _entry(doc) for doc in collection.find({"_id": {"$in": list(set(keys))}})}
+    return [docs.get(key) for key in keys]
+
+
+def quiz_question_stats(collection, quiz_id):
+    """Stored stats of every question asked in a quiz"""
+    if collection is None or not quiz_id:
+        return []
+    return [_entry(doc) for doc in collection.find({"quiz_ids": str(quiz_id)})]
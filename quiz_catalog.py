@@ -0,0 +1,237 @@
+"""
+In-memory quiz catalog for inline-query search
+- Keeps one lightweight entry per quiz (ID, name, creator, question count, penalty)
+- Prefix and token matching over quiz ID, quiz name and creator via sorted term lists
+- Caches rendered inline result cards per quiz version
+- Is synced whenever the question bank is saved, so keystrokes never reload it
+"""
+
+import bisect
+import logging
+import re
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Rebuild the catalog from storage at most this often to pick up MongoDB-side changes
+CATALOG_REFRESH_SECONDS = 300
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+|\d+', re.UNICODE)
+
+
+def _fold(text):
+    """Case- and width-fold text for matching"""
+    return unicodedata.normalize("NFKC", str(text or "")).casefold()
+
+
+def _tokens(text):
+    return TOKEN_PATTERN.findall(_fold(text))
+
+
+def quiz_metadata(quiz_id, questions):
+    """Extract the display fields inline results use from a quiz's question list"""
+    if not isinstance(questions, list):
+        questions = [questions]
+    first = questions[0] if questions and isinstance(questions[0], dict) else {}
+    name = first.get("quiz_name") or first.get("quiz_title") or f"Quiz {quiz_id}"
+    creator = first.get("creator_name") or first.get("creator") or "Unknown"
+    # Questions can carry a quiz_id field that differs from their storage key
+    alias = str(first.get("quiz_id") or quiz_id)
+    return {"name": str(name), "creator": str(creator), "count": len(questions), "alias": alias}
+
+
+class QuizCatalog:
+    """Searchable index over quiz IDs, names and creators"""
+
+    def __init__(self, default_penalty=0.0):
+        self.default_penalty = default_penalty
+        self.entries = {}          # quiz_id -> {"name", "creator", "count", "penalty", "version", "seq"}
+        self.order = []            # quiz IDs in storage order (empty-query listing)
+        self.id_lookup = {}        # folded quiz_id or quiz_id field alias -> quiz_id
+        self.terms = []            # sorted list of (term, quiz_id)
+        self.cards = {}            # quiz_id -> (version, card)
+        self.built_at = 0.0
+        self._next_seq = 0
+        self.source_version = None  # Version of the question bank file it reflects (set by the owner)
+        self._order_dirty = False
+        self._terms_dirty = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def is_stale(self):
+        return not self.built_at or time.monotonic() - self.built_at > CATALOG_REFRESH_SECONDS
+
+    # ---------- maintenance ----------
+
+    def _entry_terms(self, quiz_id, entry):
+        terms = {_fold(quiz_id)}
+        terms.update(_tokens(quiz_id))
+        terms.update(_tokens(entry["name"]))
+        terms.update(_tokens(entry["creator"]))
+        return terms
+
+    def _set_entry(self, quiz_id, meta, penalty):
+        old = self.entries.get(quiz_id)
+        version = (meta["count"], meta["name"], meta["creator"], meta["alias"], penalty)
+        if old is not None and old["version"] == version:
+            return False
+        if old is None:
+            # A removed ID may still sit in order until it is compacted; do that first
+            # so a quiz deleted and re-added under the same ID is listed once
+            self._compact_order()
+            self.order.append(quiz_id)
+            seq = self._next_seq
+            self._next_seq += 1
+        else:
+            seq = old["seq"]
+        self.entries[quiz_id] = dict(meta, penalty=penalty, version=version, seq=seq)
+        self.id_lookup.setdefault(_fold(meta["alias"]), quiz_id)
+        self.id_lookup[_fold(quiz_id)] = quiz_id
+        self._terms_dirty = True
+        return True
+
+    def rebuild(self, all_questions, penalties=None):
+        """Rebuild the whole catalog from the {quiz_id: [questions]} bank"""
+        penalties = penalties or {}
+        self.entries = {}
+        self.order = []
+        self.id_lookup = {}
+        for quiz_id, questions in (all_questions or {}).items():
+            quiz_id = str(quiz_id)
+            self._set_entry(quiz_id, quiz_metadata(quiz_id, questions),
+                            penalties.get(quiz_id, self.default_penalty))
+        # Drop cached cards for quizzes that no longer exist
+        self.cards = {k: v for k, v in self.cards.items() if k in self.entries}
+        self._rebuild_terms()
+        self.built_at = time.monotonic()
+        logger.info(f"Quiz catalog built with {len(self.entries)} quizzes")
+
+    def sync(self, all_questions):
+        """Update entries that changed after the question bank was saved"""
+        seen = set()
+        for quiz_id, questions in (all_questions or {}).items():
+            quiz_id = str(quiz_id)
+            seen.add(quiz_id)
+            old = self.entries.get(quiz_id)
+            penalty = old["penalty"] if old else self.default_penalty
+            self._set_entry(quiz_id, quiz_metadata(quiz_id, questions), penalty)
+        for quiz_id in [q for q in self.entries if q not in seen]:
+            self.remove(quiz_id)
+
+    def update_quiz(self, quiz_id, questions, penalty=None):
+        quiz_id = str(quiz_id)
+        if penalty is None:
+            old = self.entries.get(quiz_id)
+            penalty = old["penalty"] if old else self.default_penalty
+        self._set_entry(quiz_id, quiz_metadata(quiz_id, questions), penalty)
+
+    def set_penalty(self, quiz_id, penalty):
+        entry = self.entries.get(str(quiz_id))
+        if entry is not None:
+            meta = {k: entry[k] for k in ("name", "creator", "count", "alias")}
+            self._set_entry(str(quiz_id), meta, penalty)
+
+    def remove(self, quiz_id):
+        quiz_id = str(quiz_id)
+        entry = self.entries.pop(quiz_id, None)
+        if entry is None:
+            return
+        for key in (_fold(quiz_id), _fold(entry["alias"])):
+            if self.id_lookup.get(key) == quiz_id:
+                del self.id_lookup[key]
+        self.cards.pop(quiz_id, None)
+        self._order_dirty = True
+        self._terms_dirty = True
+
+    def _rebuild_terms(self):
+        terms = []
+        for quiz_id, entry in self.entries.items():
+            terms.extend((term, quiz_id) for term in self._entry_terms(quiz_id, entry))
+        terms.sort()
+        self.terms = terms
+        self._terms_dirty = False
+
+    def _compact_order(self):
+        if self._order_dirty:
+            self.order = [q for q in self.order if q in self.entries]
+            self._order_dirty = False
+
+    def _ensure_fresh(self):
+        self._compact_order()
+        if self._terms_dirty:
+            self._rebuild_terms()
+
+    # ---------- lookup ----------
+
+    def get(self, quiz_id):
+        return self.entries.get(str(quiz_id))
+
+    def resolve_id(self, quiz_id):
+        """Exact quiz ID lookup with case-insensitive and quiz_id-field fallbacks"""
+        quiz_id = str(quiz_id)
+        if quiz_id in self.entries:
+            return quiz_id
+        return self.id_lookup.get(_fold(quiz_id))
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        i = bisect.bisect_left(self.terms, (prefix,))
+        while i < len(self.terms) and self.terms[i][0].startswith(prefix):
+            matches.add(self.terms[i][1])
+            i += 1
+        return matches
+
+    def search(self, query):
+        """Return quiz IDs matching every query token by prefix, best matches first"""
+        self._ensure_fresh()
+        query = _fold(query).strip()
+        if not query:
+            return self.order
+
+        tokens = _tokens(query) or [query]
+        candidates = None
+        for token in sorted(tokens, key=len, reverse=True):
+            matched = self._prefix_matches(token)
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+
+        # The whole query may also be a quiz ID prefix containing separators
+        candidates |= self._prefix_matches(query)
+
+        def rank(quiz_id):
+            folded_id = _fold(quiz_id)
+            if folded_id == query:
+                return 0
+            if folded_id.startswith(query):
+                return 1
+            if _fold(self.entries[quiz_id]["name"]).startswith(query):
+                return 2
+            return 3
+
+        return sorted(candidates, key=lambda q: (rank(q), self.entries[q]["seq"]))
+
+    def page(self, quiz_ids, offset, page_size):
+        """Slice a result list and return (page, next_offset)"""
+        try:
+            offset = max(0, int(offset or 0))
+        except ValueError:
+            offset = 0
+        page = quiz_ids[offset:offset + page_size]
+        next_offset = str(offset + page_size) if offset + page_size < len(quiz_ids) else ""
+        return page, next_offset
+
+    def card(self, quiz_id, builder):
+        """Return the cached result card for a quiz, rebuilding it if the quiz changed"""
+        entry = self.entries.get(quiz_id)
+        if entry is None:
+            return None
+        cached = self.cards.get(quiz_id)
+        if cached is not None and cached[0] == entry["version"]:
+            return cached[1]
+        card = builder(quiz_id, entry)
+        self.cards[quiz_id] = (entry["version"], card)
+        return card
@@ -0,0 +1,147 @@
+"""
+Replay recorded Telegram updates against the bot's webhook
+- Reads updates from a JSON file (a list) or JSON lines (one update per line)
+- POSTs each one to the webhook with the secret token header, like Telegram does
+- Optional concurrency to mimic Telegram's parallel webhook connections
+- Renumbers update_id so the same file can be replayed repeatedly
+- --synthetic generates group messages and poll answers spread over many chats,
+  to load test a sharded deployment (shard_cluster.py) without recorded traffic
+
+Usage:
+    python replay_updates.py updates.jsonl [--url http://127.0.0.1:5000/telegram]
+                             [--secret $WEBHOOK_SECRET] [--concurrency 8] [--repeat 1]
+    python replay_updates.py --synthetic 10000 --chats 200 --concurrency 32
+
+Start the bot with BOT_MODE=webhook and the same WEBHOOK_SECRET first. Leave
+WEBHOOK_URL unset locally so the bot does not register the webhook with Telegram.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING
+)
+logger = logging.getLogger("replay_updates")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def load_updates(path):
+    """Updates from a JSON list file or a JSON lines file"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def synthetic_updates(count, chats, users_per_chat=20):
+    """
+    Group text messages and poll answers across chats, in interleaved order.
+    Chats are negative ids like real groups; poll ids are unregistered, so a
+    router spreads their answers by poll id.
+    """
+    updates = []
+    for i in range(count):
+        chat_id = -1000000000000 - (i % chats)
+        user = {"id": 100000 + (i // chats) % users_per_chat + (i % chats) * users_per_chat,
+                "is_bot": False, "first_name": "Load"}
+        if i % 4 == 3:
+            updates.append({"poll_answer": {"poll_id": f"load{chat_id}", "user": user, "option_ids": [i % 4]}})
+        else:
+            updates.append({"message": {
+                "message_id": i + 1, "date": int(time.time()), "from": user,
+                "chat": {"id": chat_id, "type": "supergroup", "title": f"Load {i % chats}"},
+                "text": f"load message {i}",
+            }})
+    return updates
+
+
+def post_update(url, update, secret=None, timeout=10):
+    """POST one update and return the HTTP status"""
+    request = urllib.request.Request(
+        url, data=json.dumps(update).encode("utf-8"), method="POST",
+        headers={"Content-Type": "application/json"},
+    )
+    if secret:
+        request.add_header(SECRET_HEADER, secret)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+async def replay(url, updates, secret=None, concurrency=1, repeat=1, first_update_id=1):
+    """
+    Send updates to the webhook with the given concurrency.
+    Returns {"sent", "failed", "statuses", "seconds"}.
+    """
+    queue = asyncio.Queue()
+    update_id = first_update_id
+    for _ in range(repeat):
+        for update in updates:
+            queue.put_nowait(dict(update, update_id=update_id))
+            update_id += 1
+
+    statuses = {}
+    started = time.monotonic()
+
+    async def worker():
+        while True:
+            try:
+                update = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                status = await asyncio.to_thread(post_update, url, update, secret)
+            except Exception as e:
+                logger.error(f"Update {update['update_id']} failed: {e}")
+                status = "error"
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    sent = sum(statuses.values())
+    return {
+        "sent": sent,
+        "failed": sent - statuses.get(200, 0),
+        "statuses": statuses,
+        "seconds": time.monotonic() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded updates against the bot's webhook")
+    parser.add_argument("updates", nargs="?", help="JSON or JSON lines file of Telegram updates")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.environ.get('PORT', '5000')}"
+                                         f"{os.environ.get('WEBHOOK_PATH', '/telegram')}")
+    parser.add_argument("--secret", default=os.environ.get("WEBHOOK_SECRET", ""))
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many updates instead of reading a file")
+    parser.add_argument("--chats", type=int, default=100, help="Chats the synthetic updates are spread over")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        updates = synthetic_updates(args.synthetic, max(1, args.chats))
+    elif args.updates:
+        updates = load_updates(args.updates)
+    else:
+        parser.error("give an updates file or --synthetic N")
+    result = asyncio.run(replay(args.url, updates, args.secret, args.concurrency, args.repeat))
+    rate = result["sent"] / result["seconds"] if result["seconds"] else 0
+    print(f"Sent {result['sent']} updates in {result['seconds']:.2f}s ({rate:.0f}/s), "
+          f"{result['failed']} failed, statuses: {result['statuses']}")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Run the bot as a front router plus N worker processes
+- Workers are ordinary webhook-mode bots (BOT_MODE=webhook) on PORT+1..PORT+N,
+  each told its SHARD_INDEX/SHARD_COUNT and never registering a webhook itself
+- The router owns the public webhook on PORT: it verifies Telegram's secret and
+  forwards each update to the worker that owns the update's chat
+- Poll answers carry no chat; the router resolves them through the poll registry
+  the workers write to when they send a quiz poll
+- State the workers share lives in MongoDB, the SQLite user registry and
+  lock-protected JSON files, so any worker can serve any chat after a rebalance
+
+Usage:
+    python shard_cluster.py [--workers 4]            # router + local workers
+    SHARD_INTERNAL_SECRET=... python shard_cluster.py --router-only --worker-urls host1:5001,host2:5001
+
+Set WEBHOOK_URL to the public base URL to register the webhook with Telegram.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+
+from telegram import Bot, Update
+
+import bot_config
+from log_config import setup_logging
+from sharding import PollRegistry, ShardRouter, worker_urls_from_env
+from webhook_server import WebhookServer
+
+setup_logging()
+logger = logging.getLogger("shard_cluster")
+
+WORKER_COMMAND = "import simple_bot; simple_bot.main(mode='webhook')"
+
+
+def start_workers(count, base_port, internal_secret):
+    """Spawn count webhook-mode workers; returns (processes, worker webhook URLs)"""
+    processes, urls = [], []
+    for index in range(count):
+        port = base_port + 1 + index
+        env = dict(
+            os.environ,
+            BOT_MODE="webhook",
+            PORT=str(port),
+            SHARD_INDEX=str(index),
+            SHARD_COUNT=str(count),
+            WEBHOOK_SECRET=internal_secret,
+            WEBHOOK_URL="",
+        )
+        processes.append(subprocess.Popen([sys.executable, "-c", WORKER_COMMAND], env=env))
+        urls.append(f"http://127.0.0.1:{port}{bot_config.WEBHOOK_PATH}")
+        logger.info(f"Started worker {index} (PID {processes[-1].pid}) on port {port}")
+    return processes, urls
+
+
+def poll_registry_collection():
+    """The MongoDB collection the workers register their polls in, or None if unreachable"""
+    try:
+        _, db = bot_config.connect_mongodb()
+    except Exception as e:
+        logger.warning(f"MongoDB unavailable ({e}); poll answers will be routed by poll id only")
+        return None
+    return db[bot_config.MONGO_POLL_REGISTRY_COLLECTION]
+
+
+async def serve_router(worker_urls, port, internal_secret):
+    public_secret = bot_config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    registry = PollRegistry(await asyncio.to_thread(poll_registry_collection))
+    router = ShardRouter(worker_urls, registry, internal_secret)
+
+    async def submit_update(data):
+        await router.route(data)
+
+    server = WebhookServer(
+        submit_update, bot_config.WEBHOOK_PATH, public_secret,
+        port=port, max_connections=bot_config.WEBHOOK_MAX_CONNECTIONS,
+        routes={"/metrics": lambda: (200, "text/plain; version=0.0.4",
+                                     server.metrics_text() + router.metrics_text())},
+    )
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    await server.start()
+    try:
+        if bot_config.WEBHOOK_URL:
+            async with Bot(bot_config.BOT_TOKEN) as bot:
+                await bot.set_webhook(
+                    url=bot_config.WEBHOOK_URL.rstrip("/") + server.webhook_path,
+                    secret_token=public_secret,
+                    max_connections=bot_config.WEBHOOK_MAX_CONNECTIONS,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+            logger.info(f"Webhook registered at {bot_config.WEBHOOK_URL.rstrip('/')}{server.webhook_path}")
+        else:
+            logger.warning("WEBHOOK_URL not set; routing without registering the webhook")
+        logger.info(f"Routing updates across {len(worker_urls)} workers")
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        await router.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the quiz bot sharded across worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SHARD_COUNT", "2")))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument("--router-only", action="store_true",
+                        help="Route to already running workers given by --worker-urls")
+    parser.add_argument("--worker-urls", default=os.environ.get("SHARD_WORKER_URLS", ""))
+    args = parser.parse_args(argv)
+
+    # Workers only accept updates carrying this secret, i.e. from the router
+    internal_secret = os.environ.get("SHARD_INTERNAL_SECRET") or secrets.token_urlsafe(32)
+    processes = []
+    if args.router_only:
+        urls = worker_urls_from_env(args.worker_urls)
+        if not urls:
+            parser.error("--router-only needs --worker-urls or SHARD_WORKER_URLS")
+        if not os.environ.get("SHARD_INTERNAL_SECRET"):
+            parser.error("--router-only needs SHARD_INTERNAL_SECRET, set to the workers' WEBHOOK_SECRET")
+    else:
+        processes, urls = start_workers(max(1, args.workers), args.port, internal_secret)
+
+    try:
+        asyncio.run(serve_router(urls, args.port, internal_secret))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Horizontal sharding of chats across bot worker processes
+- ConsistentHashRing maps a routing key onto one of N workers; adding a worker
+  only moves about 1/N of the chats
+- routing_key() picks the key of a raw update: its chat, or for poll answers the
+  chat that owns the poll (looked up in the PollRegistry), or the user
+- PollRegistry records which chat sent each quiz poll in MongoDB so the router
+  can send poll answers to the worker running that quiz
+- ShardRouter forwards verified webhook updates to the owning worker over
+  keep-alive HTTP connections
+- file_lock() serialises read-modify-write of JSON files shared by the workers;
+  write_json_atomic() replaces a file in one step so readers never see half of it
+"""
+
+import asyncio
+import bisect
+import contextlib
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+RING_REPLICAS = 128
+
+# Poll answers only arrive while a poll is open; keep registrations a little longer
+POLL_REGISTRY_TTL_SECONDS = 2 * 24 * 60 * 60
+POLL_CACHE_SIZE = 100000
+
+FORWARD_TIMEOUT_SECONDS = 10
+FORWARD_CONNECTIONS_PER_WORKER = 8
+
+# Update fields that carry a chat, in the order they are checked
+CHAT_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post",
+               "my_chat_member", "chat_member", "chat_join_request")
+USER_FIELDS = ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query")
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """Consistent hashing with virtual nodes"""
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key):
+        if not self._hashes:
+            raise LookupError("hash ring has no nodes")
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+
+def routing_key(update):
+    """
+    Routing key of a raw update dict: ("chat", id), ("poll", id) or ("user", id).
+    Poll keys still need resolving to a chat through the PollRegistry.
+    """
+    for field in CHAT_FIELDS:
+        chat = (update.get(field) or {}).get("chat")
+        if chat:
+            return "chat", str(chat["id"])
+    callback = update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        if message and message.get("chat"):
+            return "chat", str(message["chat"]["id"])
+        return "user", str(callback["from"]["id"])
+    if update.get("poll_answer"):
+        return "poll", str(update["poll_answer"]["poll_id"])
+    if update.get("poll"):
+        return "poll", str(update["poll"]["id"])
+    for field in USER_FIELDS:
+        sender = (update.get(field) or {}).get("from")
+        if sender:
+            return "user", str(sender["id"])
+    return "user", "0"
+
+
+def shard_key(kind, value):
+    """Key hashed onto the ring; private chats and their users land on the same worker"""
+    return value if kind in ("chat", "user") else f"{kind}:{value}"
+
+
+class PollRegistry:
+    """poll_id -> chat_id, written by the worker that sends a poll"""
+
+    def __init__(self, collection=None, cache_size=POLL_CACHE_SIZE):
+        self.collection = collection
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexed = False
+
+    def _remember(self, poll_id, chat_id):
+        with self._lock:
+            self._cache[poll_id] = chat_id
+            self._cache.move_to_end(poll_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _ensure_indexes(self):
+        if self._indexed or self.collection is None:
+            return
+        try:
+            self.collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=POLL_REGISTRY_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Could not index poll registry: {e}")
+        self._indexed = True
+
+    def register(self, poll_id, chat_id):
+        poll_id, chat_id = str(poll_id), str(chat_id)
+        self._remember(poll_id, chat_id)
+        if self.collection is None:
+            return
+        self._ensure_indexes()
+        self.collection.update_one(
+            {"_id": poll_id},
+            {"$set": {"chat_id": chat_id, "created_at": datetime.datetime.utcnow()}},
+            upsert=True,
+        )
+
+    def cached(self, poll_id):
+        """Chat of a poll registered or looked up by this process, without touching MongoDB"""
+        with self._lock:
+            return self._cache.get(str(poll_id))
+
+    def lookup(self, poll_id):
+        poll_id = str(poll_id)
+        with self._lock:
+            chat_id = self._cache.get(poll_id)
+        if chat_id is not None or self.collection is None:
+            return chat_id
+        doc = self.collection.find_one({"_id": poll_id}, {"chat_id": 1})
+        if doc:
+            self._remember(poll_id, doc["chat_id"])
+            return doc["chat_id"]
+        return None
+
+
+class WorkerClient:
+    """Minimal keep-alive HTTP/1.1 client that POSTs JSON to one worker"""
+
+    def __init__(self, url, secret_token="", max_connections=FORWARD_CONNECTIONS_PER_WORKER):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self.secret_token = secret_token
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.forwarded = 0
+        self.failed = 0
+        self.latency_total = 0.0
+
+    async def _request(self, reader, writer, payload):
+        headers = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+        )
+        if self.secret_token:
+            headers += f"X-Telegram-Bot-Api-Secret-Token: {self.secret_token}\r\n"
+        writer.write((headers + "\r\n").encode("latin-1") + payload)
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1].strip())
+        if length:
+            await reader.readexactly(length)
+        return status
+
+    async def post(self, update):
+        payload = json.dumps(update).encode("utf-8")
+        started = time.monotonic()
+        async with self._slots:
+            for attempt in range(2):
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await asyncio.open_connection(self.host, self.port)
+                try:
+                    status = await asyncio.wait_for(self._request(reader, writer, payload), FORWARD_TIMEOUT_SECONDS)
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, OSError):
+                    writer.close()
+                    # A reused connection may have been closed by the worker; retry once on a fresh one
+                    if reused and attempt == 0:
+                        continue
+                    self.failed += 1
+                    raise
+                self._idle.append((reader, writer))
+                self.forwarded += 1
+                self.latency_total += time.monotonic() - started
+                return status
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class ShardRouter:
+    """Forwards each update to the worker that owns its chat"""
+
+    def __init__(self, worker_urls, poll_registry, secret_token=""):
+        self.workers = {url: WorkerClient(url, secret_token) for url in worker_urls}
+        self.ring = ConsistentHashRing(worker_urls)
+        self.poll_registry = poll_registry
+        self.unresolved_polls = 0
+
+    async def worker_for(self, update):
+        kind, value = routing_key(update)
+        if kind == "poll":
+            chat_id = await asyncio.to_thread(self.poll_registry.lookup, value)
+            if chat_id is not None:
+                kind, value = "chat", chat_id
+            else:
+                self.unresolved_polls += 1
+        return self.ring.node_for(shard_key(kind, value))
+
+    async def route(self, update):
+        worker = await self.worker_for(update)
+        status = await self.workers[worker].post(update)
+        if status != 200:
+            logger.warning(f"Worker {worker} answered {status} for update {update.get('update_id')}")
+        return worker
+
+    def metrics_text(self):
+        lines = [
+            "# TYPE quizbot_router_forwarded_total counter",
+            "# TYPE quizbot_router_failed_total counter",
+            "# TYPE quizbot_router_forward_seconds_sum counter",
+        ]
+        for url, client in self.workers.items():
+            lines.append(f'quizbot_router_forwarded_total{{worker="{url}"}} {client.forwarded}')
+            lines.append(f'quizbot_router_failed_total{{worker="{url}"}} {client.failed}')
+            lines.append(f'quizbot_router_forward_seconds_sum{{worker="{url}"}} {client.latency_total:.6f}')
+        lines.append("# TYPE quizbot_router_unresolved_polls_total counter")
+        lines.append(f"quizbot_router_unresolved_polls_total {self.unresolved_polls}")
+        return "\n".join(lines) + "\n"
+
+    async def close(self):
+        for client in self.workers.values():
+            await client.close()
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on <path>.lock, held across a load-modify-save of a shared file"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON to a temporary file next to path and rename it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def worker_urls_from_env(value, webhook_path="/telegram"):
+    """Worker webhook URLs from a comma separated list of URLs or host:port pairs"""
+    urls = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.startswith("http"):
+            item = f"http://{item}{webhook_path}"
+        urls.append(item)
+    return urls
+
+
+def shard_index_from_env():
+    """(index, count) of this worker, (0, 1) when not sharded"""
+    try:
+        count = max(1, int(os.environ.get("SHARD_COUNT", "1")))
+        index = int(os.environ.get("SHARD_INDEX", "0"))
+    except ValueError:
+        return 0, 1
+    return index, count
@@ -3,7 +3,9 @@ Standalone web server for health checks
 """
 import os
 import logging
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+
+from health import proxy_health
 
 # Configure logging
 logging.basicConfig(
@@ -25,11 +27,12 @@ def index():
     })
 
 @app.route('/health')
+@app.route('/health/live')
+@app.route('/health/ready')
 def health():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "healthy"
-    })
+    """Health check endpoint: relays the bot process's own /health, /health/live or /health/ready"""
+    status, body = proxy_health(request.path)
+    return jsonify(body), status
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
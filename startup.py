@@ -0,0 +1,90 @@
+"""
+Cold-start helpers
+- module_available() checks an optional dependency without importing it
+- lazy_import() returns a module proxy that imports on first attribute access,
+  so OCR/PDF/report backends cost nothing until a user needs them
+- StartupPhases times and logs each startup phase, and the time from process
+  start until the bot is ready to serve its first update
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Taken when this module is first imported; simple_bot imports it first thing
+PROCESS_STARTED = time.perf_counter()
+
+_available = {}
+
+
+def module_available(name):
+    """True if the module can be imported (its top-level package is installed)"""
+    if name not in _available:
+        try:
+            _available[name] = importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):
+            _available[name] = False
+    return _available[name]
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is first used"""
+
+    def __init__(self, name, on_load=None):
+        self._lazy_name = name
+        self._lazy_on_load = on_load
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+
+    def _load(self):
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self._lazy_name)
+                if self._lazy_on_load is not None:
+                    self._lazy_on_load(module)
+                self._lazy_module = module
+                logger.info(f"Loaded {self._lazy_name} on first use in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return self._lazy_module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    """A module proxy; on_load(module) runs once, right after the real import"""
+    return LazyModule(name, on_load)
+
+
+class StartupPhases:
+    """
+    Durations of consecutive startup phases, logged as they finish.
+    mark(name) closes the phase that began at the previous mark (or at process start).
+    """
+
+    def __init__(self, started=None):
+        self.started = PROCESS_STARTED if started is None else started
+        self.phases = []
+        self.ready_at = None
+        self._last = self.started
+
+    def mark(self, name):
+        now = time.perf_counter()
+        elapsed, self._last = now - self._last, now
+        self.phases.append((name, elapsed))
+        logger.info(f"Startup phase '{name}' took {elapsed * 1000:.0f} ms")
+        return elapsed
+
+    def ready(self):
+        """Mark the bot as ready to serve updates and log the summary"""
+        self.ready_at = time.perf_counter()
+        summary = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        logger.info(f"Ready to serve updates {(self.ready_at - self.started) * 1000:.0f} ms after start ({summary})")
@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark for the bot
+- Imports simple_bot in fresh interpreters, like every deploy and restart does,
+  and reports the median wall time against a budget
+- Runs one import under `python -X importtime` and lists the slowest modules
+  simple_bot imports directly, by cumulative time
+- Fails if an OCR/PDF/report backend that should load on first use was imported
+
+Usage:
+    python startup_benchmark.py [--runs 5] [--budget-ms $STARTUP_BUDGET_MS] [--top 15]
+
+Exits 1 when over budget or when a lazy backend was imported eagerly, so it can
+run in CI. Needs the bot's dependencies installed; it makes no network calls.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_BUDGET_MS = 2000
+
+# Modules simple_bot must not import at startup
+LAZY_MODULES = ("PIL", "pytesseract", "pdfplumber", "fitz", "PyPDF2", "reportlab", "numpy")
+
+_IMPORT_SNIPPET = (
+    "import sys, simple_bot; "
+    "print(','.join(name for name in {lazy!r} if name in sys.modules))"
+)
+
+
+def _run(args):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=PROJECT_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import failed:\n{result.stderr[-2000:]}")
+    return elapsed, result.stdout, result.stderr
+
+
+def measure_import(runs):
+    """Wall seconds of each fresh-interpreter import, and the lazy modules that got imported"""
+    snippet = _IMPORT_SNIPPET.format(lazy=LAZY_MODULES)
+    # Warm-up run: compiles bytecode so every measured run starts from the same cache
+    _, stdout, _ = _run(["-c", snippet])
+    lines = stdout.splitlines()
+    eager = [name for name in lines[-1].split(",") if name] if lines else []
+    timings = [_run(["-c", snippet])[0] for _ in range(runs)]
+    return timings, eager
+
+
+def parse_importtime(stderr):
+    """(cumulative microseconds, nesting depth, module) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        # Nested imports are indented two spaces per level below the module that triggered them
+        name = fields[2][1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((int(fields[1]), depth, name.strip()))
+    return rows
+
+
+def slowest_imports(top):
+    """The bot's own import time and its slowest direct imports, by cumulative time"""
+    _, _, stderr = _run(["-X", "importtime", "-c", "import simple_bot"])
+    rows = parse_importtime(stderr)
+    total = next((cumulative for cumulative, depth, name in rows if depth == 0 and name == "simple_bot"), 0)
+    direct = [(cumulative, name) for cumulative, depth, name in rows if depth == 1]
+    direct.sort(reverse=True)
+    return total, direct[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long importing the bot takes")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--top", type=int, default=15, help="Slowest direct imports to list")
+    args = parser.parse_args(argv)
+
+    timings, eager = measure_import(max(1, args.runs))
+    median_ms = statistics.median(timings) * 1000
+    print(f"import simple_bot: median {median_ms:.0f} ms, min {min(timings) * 1000:.0f} ms, "
+          f"max {max(timings) * 1000:.0f} ms over {len(timings)} runs (budget {args.budget_ms:.0f} ms)")
+
+    if args.top:
+        total_us, rows = slowest_imports(args.top)
+        print(f"\nUnder -X importtime simple_bot took {total_us / 1000:.1f} ms; slowest direct imports (cumulative):")
+        for cumulative_us, name in rows:
+            print(f"{cumulative_us / 1000:9.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"\nFAIL: imported at startup but should load on first use: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"\nFAIL: startup {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
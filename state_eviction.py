@@ -0,0 +1,185 @@
+"""
+Bounded per-chat and per-user state
+- archive_quiz() replaces a finished quiz in chat_data (every question, every
+  poll with every answer, participants, answer matrix, question statistics) by
+  a small summary once its results have been sent
+- IdleStateEvictor records when each chat and user was last seen (group -1
+  TypeHandler) and, on each sweep, drops chat_data and user_data that has been
+  idle longer than its TTL, least recently seen first, and whatever exceeds the
+  entry caps (LRU)
+- Chats with a quiz in progress are never evicted; they count as just seen
+- Abandoned /create drafts (user_data["create_quiz"]) go after their own,
+  shorter TTL; requires_create_draft() ends the conversation of a user whose
+  draft is gone instead of building a quiz from nothing
+"""
+
+import functools
+import logging
+import time
+from collections import OrderedDict
+
+from telegram.ext import ConversationHandler
+
+logger = logging.getLogger(__name__)
+
+# Defaults: a day for idle chats and users, six hours for an untouched draft
+DEFAULT_CHAT_TTL_SECONDS = 24 * 3600
+DEFAULT_USER_TTL_SECONDS = 24 * 3600
+DEFAULT_DRAFT_TTL_SECONDS = 6 * 3600
+DEFAULT_MAX_CHATS = 50000
+DEFAULT_MAX_USERS = 200000
+
+# Top scores kept in an archived quiz
+ARCHIVE_TOP_SCORES = 3
+
+DRAFT_KEY = "create_quiz"
+
+
+def archive_quiz(quiz, result_id=None, top_scores=(), now=None):
+    """
+    The summary kept in chat_data once a quiz is over: ids, title, sizes and the
+    top scores as (name, score). The full quiz stays reachable by any task that
+    still holds it, marked inactive.
+    """
+    quiz["active"] = False
+    return {
+        "active": False,
+        "archived": True,
+        "quiz_id": quiz.get("quiz_id"),
+        "title": quiz.get("title"),
+        "chat_id": quiz.get("chat_id"),
+        "questions_count": len(quiz.get("questions", [])),
+        "participants_count": len(quiz.get("participants", {})),
+        "result_id": result_id,
+        "top_scores": list(top_scores)[:ARCHIVE_TOP_SCORES],
+        "ended_at": time.time() if now is None else now,
+    }
+
+
+def quiz_in_progress(chat_data):
+    return bool(chat_data.get("quiz", {}).get("active"))
+
+
+def requires_create_draft(handler_func):
+    """Decorator for /create conversation steps: end the conversation if the draft was evicted"""
+    @functools.wraps(handler_func)
+    async def wrapper(update, context, *args, **kwargs):
+        if DRAFT_KEY not in context.user_data:
+            if update.effective_message:
+                await update.effective_message.reply_text(
+                    "⌛ Your quiz draft expired after a long pause. Send /create to start again."
+                )
+            return ConversationHandler.END
+        return await handler_func(update, context, *args, **kwargs)
+    return wrapper
+
+
+class IdleStateEvictor:
+    """Least-recently-seen order of chats and users, and the sweep that evicts their idle state"""
+
+    def __init__(self, chat_ttl=DEFAULT_CHAT_TTL_SECONDS, user_ttl=DEFAULT_USER_TTL_SECONDS,
+                 draft_ttl=DEFAULT_DRAFT_TTL_SECONDS, max_chats=DEFAULT_MAX_CHATS, max_users=DEFAULT_MAX_USERS,
+                 chat_busy=quiz_in_progress, clock=time.monotonic):
+        self.chat_ttl = chat_ttl
+        self.user_ttl = user_ttl
+        self.draft_ttl = draft_ttl
+        self.max_chats = max_chats
+        self.max_users = max_users
+        self.chat_busy = chat_busy
+        self.clock = clock
+        self.chats = OrderedDict()  # chat_id -> last seen, least recent first
+        self.users = OrderedDict()
+        self.evicted = {"chat_data": 0, "user_data": 0, "drafts": 0}
+        self.sweeps = 0
+
+    def touch(self, chat_id=None, user_id=None):
+        now = self.clock()
+        for seen, key in ((self.chats, chat_id), (self.users, user_id)):
+            if key is not None:
+                seen[key] = now
+                seen.move_to_end(key)
+
+    async def observe(self, update, context):
+        """Group -1 TypeHandler callback: marks the update's chat and user as just seen"""
+        chat = update.effective_chat
+        user = update.effective_user
+        self.touch(chat.id if chat else None, user.id if user else None)
+
+    # ---------- sweeping ----------
+
+    def sweep(self, application):
+        """Evict idle and over-cap entries now; returns what was evicted"""
+        now = self.clock()
+        before = dict(self.evicted)
+        self._adopt(self.chats, application.chat_data, now)
+        self._adopt(self.users, application.user_data, now)
+        self._sweep_chats(application, now)
+        self._sweep_users(application, now)
+        self.sweeps += 1
+        evicted = {kind: self.evicted[kind] - before[kind] for kind in self.evicted}
+        if any(evicted.values()):
+            logger.info("Evicted idle state: %s chats, %s users, %s drafts (tracking %s chats, %s users)",
+                        evicted["chat_data"], evicted["user_data"], evicted["drafts"],
+                        len(self.chats), len(self.users))
+        return evicted
+
+    @staticmethod
+    def _adopt(seen, data, now):
+        """Start the clock for entries created without an update (e.g. by a scheduled task)"""
+        for key in list(data):
+            if key not in seen:
+                seen[key] = now
+        for key in [key for key in seen if key not in data]:
+            del seen[key]
+
+    def _sweep_chats(self, application, now):
+        for _ in range(len(self.chats)):
+            chat_id, last_seen = next(iter(self.chats.items()))
+            if now - last_seen <= self.chat_ttl and len(self.chats) <= self.max_chats:
+                break
+            chat_data = application.chat_data.get(chat_id)
+            if chat_data is not None and self.chat_busy(chat_data):
+                # Running quiz: its answers carry no chat, so keep it as if just seen
+                self.chats[chat_id] = now
+                self.chats.move_to_end(chat_id)
+                continue
+            del self.chats[chat_id]
+            if chat_data is not None:
+                application.drop_chat_data(chat_id)
+                _forget_pending_deletion(application, "_chat_ids_to_be_deleted_in_persistence", chat_id)
+                self.evicted["chat_data"] += 1
+
+    def _sweep_users(self, application, now):
+        shortest_ttl = min(self.draft_ttl, self.user_ttl)
+        for user_id, last_seen in list(self.users.items()):
+            idle = now - last_seen
+            over_cap = len(self.users) > self.max_users
+            if idle <= shortest_ttl and not over_cap:
+                break
+            user_data = application.user_data.get(user_id)
+            if idle > self.user_ttl or over_cap:
+                del self.users[user_id]
+                if user_data is not None:
+                    application.drop_user_data(user_id)
+                    _forget_pending_deletion(application, "_user_ids_to_be_deleted_in_persistence", user_id)
+                    self.evicted["user_data"] += 1
+            elif user_data is not None and user_data.pop(DRAFT_KEY, None) is not None:
+                self.evicted["drafts"] += 1
+
+    def metrics_text(self):
+        """Tracked entries and evictions in Prometheus text format"""
+        lines = [
+            "# TYPE quizbot_state_entries gauge",
+            f'quizbot_state_entries{{kind="chat_data"}} {len(self.chats)}',
+            f'quizbot_state_entries{{kind="user_data"}} {len(self.users)}',
+            "# TYPE quizbot_state_evicted_total counter",
+        ]
+        lines.extend(f'quizbot_state_evicted_total{{kind="{kind}"}} {count}' for kind, count in self.evicted.items())
+        return "\n".join(lines) + "\n"
+
+
+def _forget_pending_deletion(application, attribute, key):
+    # drop_chat_data/drop_user_data queue the id for the persistence layer; with no
+    # persistence that set is never flushed and would grow by one id per eviction
+    if application.persistence is None:
+        getattr(application, attribute, set()).discard(key)
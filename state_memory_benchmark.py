@@ -0,0 +1,152 @@
+"""
+Memory of per-chat and per-user state over a simulated day of traffic
+- Quizzes run in a sliding population of group chats; every question is a
+  poll with every participant's answer, stored the way poll_answer stores it
+- Users start /create drafts, and some abandon them half way
+- "unbounded" keeps every finished quiz and all chat/user data, as the bot did;
+  "bounded" archives each quiz when it ends (archive_quiz) and sweeps idle
+  state every STATE_SWEEP_SECONDS (IdleStateEvictor) on a simulated clock
+- Reports traced memory (tracemalloc) and entry counts every few hours
+
+Usage:
+    python state_memory_benchmark.py [--hours 24] [--quizzes-per-hour 120]
+        [--chat-ttl-hours 24] [--user-ttl-hours 24] [--draft-ttl-hours 6]
+
+Runs on a real (never started) telegram.ext.Application, so chat_data and
+user_data are dropped exactly as in the bot. Use --hours 72 to see the
+steady state once the TTLs start to bite. The answer matrix (NumPy) is left
+out of the quiz, so the unbounded figures are if anything on the low side.
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+
+from telegram.ext import Application, CallbackContext
+
+from state_eviction import DRAFT_KEY, IdleStateEvictor, archive_quiz
+
+SWEEP_SECONDS = 300
+
+# New chats and users showing up per hour; quizzes pick from those seen in the last day or two
+NEW_CHATS_PER_HOUR = 40
+NEW_USERS_PER_HOUR = 400
+CHAT_WINDOW = NEW_CHATS_PER_HOUR * 36
+USER_WINDOW = NEW_USERS_PER_HOUR * 36
+
+
+def make_question(rng, index):
+    return {
+        "question": f"Question {index}: " + " ".join(rng.choice(("which", "of", "the", "following", "is"))
+                                                    for _ in range(12)),
+        "options": [f"Option {letter} " + "x" * rng.randint(5, 30) for letter in "ABCD"],
+        "answer": rng.randint(0, 3),
+        "category": "General Knowledge",
+    }
+
+
+def play_quiz(rng, chat_id, quiz_id, users, questions_count, poll_base):
+    """A finished quiz as end_quiz sees it: questions, polls with answers, participants"""
+    questions = [make_question(rng, i) for i in range(questions_count)]
+    quiz = {
+        "active": True, "current_index": 0, "questions": questions, "sent_polls": {}, "participants": {},
+        "chat_id": chat_id, "creator": {"id": users[0], "name": f"User{users[0]}"},
+        "quiz_id": quiz_id, "title": f"Quiz {quiz_id}", "negative_marking": 0.25, "custom_timer": 25,
+        "question_stats": {},
+    }
+    for index, question in enumerate(questions):
+        answers = {}
+        for user_id in users:
+            if rng.random() < 0.85:
+                option = rng.randint(0, 3)
+                answers[str(user_id)] = {"user_name": f"User{user_id}", "username": f"user{user_id}",
+                                         "option_id": option, "is_correct": option == question["answer"]}
+                entry = quiz["participants"].setdefault(str(user_id), {
+                    "name": f"User{user_id}", "username": f"user{user_id}", "correct": 0, "answered": 0,
+                    "participation": 0})
+                entry["answered"] += 1
+                entry["participation"] += 1
+                entry["correct"] += option == question["answer"]
+        quiz["sent_polls"][str(poll_base + index)] = {"question_index": index, "message_id": index, "answers": answers}
+        quiz["question_stats"][f"q{quiz_id}:{index}"] = {"attempts": len(answers), "correct": 0, "options": [0] * 4}
+    quiz["current_index"] = questions_count - 1
+    return quiz
+
+
+def simulate(hours, quizzes_per_hour, bounded, chat_ttl, user_ttl, draft_ttl, seed=1, report_every=4):
+    rng = random.Random(seed)
+    clock = [0.0]
+    application = Application.builder().token("123456:SIMULATION").build()
+    evictor = IdleStateEvictor(chat_ttl=chat_ttl, user_ttl=user_ttl, draft_ttl=draft_ttl, clock=lambda: clock[0])
+    rows = []
+    next_sweep = SWEEP_SECONDS
+    poll_base = 0
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    events_per_hour = quizzes_per_hour * 2
+    for hour in range(hours):
+        newest_chat = (hour + 1) * NEW_CHATS_PER_HOUR
+        newest_user = (hour + 1) * NEW_USERS_PER_HOUR
+        for event in range(events_per_hour):
+            clock[0] = hour * 3600 + event * 3600 / events_per_hour
+            if bounded and clock[0] >= next_sweep:
+                evictor.sweep(application)
+                next_sweep += SWEEP_SECONDS
+            if event % 2 == 0:
+                chat_id = -1000000 - rng.randrange(max(0, newest_chat - CHAT_WINDOW), newest_chat)
+                players = rng.sample(range(max(0, newest_user - USER_WINDOW), newest_user), rng.randint(5, 40))
+                context = CallbackContext(application, chat_id=chat_id, user_id=players[0])
+                quiz = play_quiz(rng, chat_id, f"{hour}-{event}", players, rng.randint(10, 30), poll_base)
+                poll_base += len(quiz["questions"])
+                if rng.random() < 0.2:
+                    context.chat_data["live_standings"] = True
+                evictor.touch(chat_id, players[0])
+                for user_id in players[1:]:
+                    CallbackContext(application, user_id=user_id).user_data.setdefault("answered", True)
+                    evictor.touch(user_id=user_id)
+                quiz["active"] = False
+                context.chat_data["quiz"] = archive_quiz(quiz, top_scores=[("User", 10)]) if bounded else quiz
+            else:
+                user_id = rng.randrange(max(0, newest_user - USER_WINDOW), newest_user)
+                context = CallbackContext(application, user_id=user_id)
+                draft = {"title": f"Draft by {user_id}", "questions": [make_question(rng, i) for i in range(rng.randint(10, 50))]}
+                context.user_data[DRAFT_KEY] = draft
+                evictor.touch(user_id=user_id)
+                if rng.random() < 0.6:
+                    context.user_data.pop(DRAFT_KEY, None)  # finished (or cancelled) in the same sitting
+        if (hour + 1) % report_every == 0 or hour + 1 == hours:
+            current, peak = tracemalloc.get_traced_memory()
+            drafts = sum(1 for data in application.user_data.values() if DRAFT_KEY in data)
+            rows.append((hour + 1, current - baseline, peak - baseline, len(application.chat_data),
+                         len(application.user_data), drafts))
+    tracemalloc.stop()
+    return rows, dict(evictor.evicted)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a day of quiz traffic and measure chat/user state memory")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--quizzes-per-hour", type=int, default=120)
+    parser.add_argument("--chat-ttl-hours", type=float, default=24)
+    parser.add_argument("--user-ttl-hours", type=float, default=24)
+    parser.add_argument("--draft-ttl-hours", type=float, default=6)
+    args = parser.parse_args(argv)
+
+    ttls = (args.chat_ttl_hours * 3600, args.user_ttl_hours * 3600, args.draft_ttl_hours * 3600)
+    for label, bounded in (("unbounded", False), ("bounded", True)):
+        rows, evicted = simulate(max(1, args.hours), max(1, args.quizzes_per_hour), bounded, *ttls)
+        print(f"\n{label}:")
+        print(f"{'hour':>5} {'current MiB':>12} {'peak MiB':>9} {'chats':>7} {'users':>7} {'drafts':>7}")
+        for hour, current, peak, chats, users, drafts in rows:
+            print(f"{hour:5d} {current / 2**20:12.1f} {peak / 2**20:9.1f} {chats:7d} {users:7d} {drafts:7d}")
+        if bounded:
+            print(f"evicted: {evicted['chat_data']} chat_data, {evicted['user_data']} user_data, "
+                  f"{evicted['drafts']} drafts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Time-bucketed quiz statistics rollups
+- One MongoDB document per (scope, owner, period, bucket), e.g. user 42 on 2026-10-19
+- Daily, weekly, monthly and yearly counters per user and per quiz
+- Maintained with one unordered bulk_write of $inc upserts at quiz end
+- The one source of every per-period view: time analytics and the current
+  day/week/month/year stats read a handful of bucket documents instead of
+  the capped history in the profiles
+- rebuild_rollups() recomputes everything from quiz_results.json into a staging
+  collection and swaps it in (see backfill_rollups.py)
+"""
+
+import datetime
+import logging
+
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = {
+    "daily": "%Y-%m-%d",
+    "weekly": "%Y-%W",
+    "monthly": "%Y-%m",
+    "yearly": "%Y",
+}
+
+# Key naming the bucket in current_period_stats(), as profile views read it
+PERIOD_LABELS = {"daily": "date", "weekly": "week", "monthly": "month", "yearly": "year"}
+
+SCOPE_USER = "user"
+SCOPE_QUIZ = "quiz"
+
+COUNTER_FIELDS = ("quizzes", "questions", "correct", "incorrect", "score_sum")
+
+ROLLUP_INDEX = [("scope", ASCENDING), ("owner_id", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)]
+
+_indexed_collections = set()
+
+
+def bucket_key(period, when):
+    return when.strftime(ROLLUP_PERIODS[period])
+
+
+def rollup_id(scope, owner_id, period, bucket):
+    return f"{scope}:{owner_id}:{period}:{bucket}"
+
+
+def ensure_rollup_indexes(collection):
+    """Index bucket lookups by owner and period once per process"""
+    if collection is None or collection.full_name in _indexed_collections:
+        return
+    try:
+        collection.create_index(ROLLUP_INDEX)
+    except Exception as e:
+        logger.error(f"Could not index {collection.full_name}: {e}")
+    _indexed_collections.add(collection.full_name)
+
+
+def result_counters(total_questions, correct_answers, wrong_answers, percentage_score):
+    return {
+        "quizzes": 1,
+        "questions": total_questions,
+        "correct": correct_answers,
+        "incorrect": wrong_answers,
+        "score_sum": percentage_score,
+    }
+
+
+def rollup_operations(quiz_id, user_id, counters, when):
+    """UpdateOne upserts adding one quiz result to every user and quiz bucket it falls in"""
+    operations = []
+    for scope, owner_id in ((SCOPE_USER, str(user_id)), (SCOPE_QUIZ, str(quiz_id))):
+        for period in ROLLUP_PERIODS:
+            bucket = bucket_key(period, when)
+            operations.append(UpdateOne(
+                {"_id": rollup_id(scope, owner_id, period, bucket)},
+                {
+                    "$inc": counters,
+                    "$setOnInsert": {"scope": scope, "owner_id": owner_id, "period": period, "bucket": bucket},
+                },
+                upsert=True,
+            ))
+    return operations
+
+
+def record_quiz_rollups(collection, quiz_id, user_id, total_questions, correct_answers,
+                        wrong_answers, percentage_score, when=None):
+    """Add a finished quiz to the user's and the quiz's rollups in one round trip"""
+    if collection is None:
+        return False
+    ensure_rollup_indexes(collection)
+    counters = result_counters(total_questions, correct_answers, wrong_answers, percentage_score)
+    collection.bulk_write(
+        rollup_operations(quiz_id, user_id, counters, when or datetime.datetime.now()),
+        ordered=False,
+    )
+    return True
+
+
+def get_rollups(collection, scope, owner_id, period, start_bucket=None, end_bucket=None):
+    """Return {bucket: counters} for one owner and period, optionally limited to a bucket range"""
+    if collection is None:
+        return {}
+    query = {"scope": scope, "owner_id": str(owner_id), "period": period}
+    if start_bucket or end_bucket:
+        query["bucket"] = {}
+        if start_bucket:
+            query["bucket"]["$gte"] = start_bucket
+        if end_bucket:
+            query["bucket"]["$lte"] = end_bucket
+    projection = {field: 1 for field in COUNTER_FIELDS}
+    projection["bucket"] = 1
+    return {
+        doc["bucket"]: {field: doc.get(field, 0) for field in COUNTER_FIELDS}
+        for doc in collection.find(query, projection)
+    }
+
+
+def summarize(buckets):
+    """Sum bucket counters and add the average score percentage"""
+    total = {field: 0 for field in COUNTER_FIELDS}
+    for counters in buckets:
+        for field in COUNTER_FIELDS:
+            total[field] += counters.get(field, 0)
+    total["avg_score"] = total["score_sum"] / total["quizzes"] if total["quizzes"] else 0
+    return total
+
+
+def current_period_stats(collection, scope, owner_id, now=None):
+    """This day, week, month and year's counters in one query, as {period: {..., label: bucket}}"""
+    now = now or datetime.datetime.now()
+    buckets = {period: bucket_key(period, now) for period in ROLLUP_PERIODS}
+    docs = {}
+    if collection is not None:
+        ids = [rollup_id(scope, str(owner_id), period, bucket) for period, bucket in buckets.items()]
+        docs = {doc["period"]: doc for doc in collection.find({"_id": {"$in": ids}})}
+    stats = {}
+    for period, bucket in buckets.items():
+        stats[period] = summarize([docs.get(period, {})])
+        stats[period][PERIOD_LABELS[period]] = bucket
+    return stats
+
+
+def time_analytics(collection, scope, owner_id, now=None):
+    """
+    Activity for today, the last 7 and 30 days and the last 12 months, plus
+    monthly averages for trend analysis. Reads at most 30 daily and 12
+    monthly bucket documents.
+    """
+    now = now or datetime.datetime.now()
+    today = now.date()
+    daily = get_rollups(collection, scope, owner_id, "daily",
+                        bucket_key("daily", today - datetime.timedelta(days=29)), bucket_key("daily", today))
+    month_start = (today.replace(day=1) - datetime.timedelta(days=334)).replace(day=1)
+    monthly = get_rollups(collection, scope, owner_id, "monthly",
+                          bucket_key("monthly", month_start), bucket_key("monthly", today))
+
+    def last_days(days):
+        start = bucket_key("daily", today - datetime.timedelta(days=days - 1))
+        return summarize(counters for bucket, counters in daily.items() if bucket >= start)
+
+    return {
+        "today": last_days(1),
+        "last_7_days": last_days(7),
+        "last_30_days": last_days(30),
+        "last_12_months": summarize(monthly.values()),
+        "monthly_averages": [
+            (bucket, counters["score_sum"] / counters["quizzes"])
+            for bucket, counters in sorted(monthly.items())
+            if counters.get("quizzes")
+        ],
+    }
+
+
+def aggregate_results(quiz_results):
+    """Compute every rollup bucket from the quiz_results.json structure"""
+    rollups = {}
+    skipped = 0
+    for quiz_id, quiz_data in (quiz_results or {}).items():
+        if not isinstance(quiz_data, dict):
+            continue
+        for participant in quiz_data.get("participants", []):
+            try:
+                when = datetime.datetime.fromisoformat(participant["timestamp"])
+                total_questions = int(participant.get("total_questions", 0) or 0)
+                adjusted_score = float(participant.get("adjusted_score", 0) or 0)
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            percentage = adjusted_score / total_questions * 100 if total_questions > 0 else 0
+            counters = result_counters(
+                total_questions,
+                int(participant.get("correct_answers", 0) or 0),
+                int(participant.get("wrong_answers", 0) or 0),
+                percentage,
+            )
+            for scope, owner_id in ((SCOPE_USER, str(participant.get("user_id", ""))), (SCOPE_QUIZ, str(quiz_id))):
+                for period in ROLLUP_PERIODS:
+                    bucket = bucket_key(period, when)
+                    doc = rollups.get(rollup_id(scope, owner_id, period, bucket))
+                    if doc is None:
+                        doc = rollups[rollup_id(scope, owner_id, period, bucket)] = dict(
+                            {field: 0 for field in COUNTER_FIELDS},
+                            scope=scope, owner_id=owner_id, period=period, bucket=bucket,
+                        )
+                    for field, value in counters.items():
+                        doc[field] += value
+    return rollups, skipped
+
+
+def rebuild_rollups(collection, quiz_results, batch_size=1000):
+    """
+    Replace all rollups with values computed from quiz_results.json.
+    The buckets are written to a staging collection that is then renamed over
+    the live one, so readers never see the rollups empty or half written and
+    the rebuild can be rerun safely. Quiz ends recorded while it runs are kept
+    only if they are already in the results it was given.
+    """
+    rollups, skipped = aggregate_results(quiz_results)
+    staging = collection.database[f"{collection.name}_rebuild"]
+    staging.drop()
+    staging.create_index(ROLLUP_INDEX)
+    documents = [dict(doc, _id=doc_id) for doc_id, doc in rollups.items()]
+    for start in range(0, len(documents), batch_size):
+        staging.insert_many(documents[start:start + batch_size], ordered=False)
+    staging.rename(collection.name, dropTarget=True)
+    return len(rollups), skipped
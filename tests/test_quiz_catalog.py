@@ -0,0 +1,26 @@
+from quiz_catalog import QuizCatalog
+
+
+def make_quiz(name):
+    return [{"question": "Q?", "options": ["A", "B"], "answer": 0, "quiz_name": name, "creator": "Tester"}]
+
+
+def test_removed_quiz_re_added_under_same_id_is_listed_once():
+    catalog = QuizCatalog()
+    catalog.rebuild({"a": make_quiz("Alpha"), "b": make_quiz("Beta")})
+
+    catalog.remove("a")
+    catalog.update_quiz("a", make_quiz("Alpha again"))
+
+    assert catalog.search("") == ["b", "a"]
+    assert catalog.search("alpha") == ["a"]
+
+
+def test_removed_quiz_is_not_listed():
+    catalog = QuizCatalog()
+    catalog.rebuild({"a": make_quiz("Alpha"), "b": make_quiz("Beta")})
+
+    catalog.remove("a")
+
+    assert catalog.search("") == ["b"]
+    assert catalog.search("alpha") == []
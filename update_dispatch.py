@@ -0,0 +1,208 @@
+"""
+Concurrent update processing with per-chat ordering
+- Updates for different chats run concurrently; updates for the same chat (or
+  the same user, outside chats) run one at a time, in arrival order
+- A global limit bounds updates in flight; a smaller limit bounds heavy work
+  (reports, PDF/TXT imports) so it cannot take every slot; heavy updates wait
+  for their own slot before taking a global one
+- An update waits for its chat before taking a global slot, so a flood in one
+  chat cannot starve the others
+- Queue depth, in-flight counts and waiting times exported for /metrics
+- on_done(update, seconds, error) post-hook after each update, for latency metrics
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_UPDATES = 64
+DEFAULT_HEAVY_CONCURRENCY = 4
+
+# Commands whose handlers render reports or parse files
+HEAVY_COMMANDS = frozenset({
+    "htmlreport", "userprofile_pdf", "duplicates", "mongodbstatus", "botstats",
+})
+
+
+def default_order_key(update):
+    """Chat id, else user id, else None (no ordering needed)"""
+    if isinstance(update, Update):
+        if update.effective_chat is not None:
+            return f"chat:{update.effective_chat.id}"
+        if update.effective_user is not None:
+            return f"user:{update.effective_user.id}"
+    return None
+
+
+def is_heavy_update(update):
+    """Documents to import and report commands"""
+    message = update.effective_message if isinstance(update, Update) else None
+    if message is None:
+        return False
+    if message.document is not None:
+        return True
+    text = message.text or ""
+    if not text.startswith("/"):
+        return False
+    command = text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() if len(text) > 1 else ""
+    return command in HEAVY_COMMANDS
+
+
+class _KeyQueue:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Update processor for ApplicationBuilder.concurrent_updates().
+    order_key(update) returns the key updates are serialised on (None = unordered).
+    """
+
+    def __init__(self, max_concurrent_updates=DEFAULT_MAX_CONCURRENT_UPDATES,
+                 heavy_concurrency=DEFAULT_HEAVY_CONCURRENCY, order_key=None, heavy=None, on_done=None):
+        super().__init__(max_concurrent_updates)
+        self.order_key = order_key or default_order_key
+        self.is_heavy = heavy or is_heavy_update
+        self.on_done = on_done
+        self.heavy_concurrency = max(1, min(heavy_concurrency, max_concurrent_updates))
+        self._heavy_slots = asyncio.BoundedSemaphore(self.heavy_concurrency)
+        self._keys = {}
+        self.in_flight = 0
+        self.heavy_in_flight = 0
+        # Accepted but not started yet (waiting for their chat or for a slot)
+        self.backlog = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.peak_key_depth = 0
+        self.processed = 0
+        self.failed = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_done_at = None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_update(self, update, coroutine):
+        self.backlog += 1
+        key = self.order_key(update)
+        if key is None:
+            await self._run(update, coroutine, time.monotonic())
+            return
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = _KeyQueue()
+        entry.pending += 1
+        self.peak_key_depth = max(self.peak_key_depth, entry.pending)
+        queued_at = time.monotonic()
+        entered = False
+        try:
+            # Acquired in arrival order (asyncio.Lock is FIFO), before any other await
+            async with entry.lock:
+                entered = True
+                await self._run(update, coroutine, queued_at)
+        finally:
+            if not entered:
+                self.backlog -= 1
+            entry.pending -= 1
+            if entry.pending == 0 and self._keys.get(key) is entry:
+                del self._keys[key]
+
+    async def _run(self, update, coroutine, queued_at):
+        heavy = self.is_heavy(update)
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = False
+        try:
+            # Heavy slot first: queued heavy updates must not sit on global slots
+            async with self._heavy_slots if heavy else contextlib.nullcontext():
+                async with self._semaphore:
+                    started = True
+                    self.waiting -= 1
+                    self.backlog -= 1
+                    waited = time.monotonic() - queued_at
+                    self.wait_seconds_total += waited
+                    self.max_wait_seconds = max(self.max_wait_seconds, waited)
+                    self.in_flight += 1
+                    self.heavy_in_flight += heavy
+                    try:
+                        await self.do_process_update(update, coroutine)
+                    finally:
+                        self.in_flight -= 1
+                        self.heavy_in_flight -= heavy
+        finally:
+            # Cancelled while still queued (e.g. at shutdown)
+            if not started:
+                self.waiting -= 1
+                self.backlog -= 1
+
+    async def do_process_update(self, update, coroutine):
+        started = time.perf_counter()
+        error = False
+        try:
+            await coroutine
+        except Exception as e:
+            # Application.process_update reports handler errors itself; this is a last resort
+            error = True
+            self.failed += 1
+            logger.error(f"Error processing update: {e}")
+        finally:
+            self.processed += 1
+            self.last_done_at = time.time()
+            if self.on_done is not None:
+                self.on_done(update, time.perf_counter() - started, error)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "heavy_in_flight": self.heavy_in_flight,
+            "waiting": self.waiting,
+            "backlog": self.backlog,
+            "busy_keys": len(self._keys),
+            "queued": sum(entry.pending for entry in self._keys.values()),
+            "peak_waiting": self.peak_waiting,
+            "peak_key_depth": self.peak_key_depth,
+            "processed": self.processed,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+    def metrics_text(self):
+        """Dispatcher gauges and counters in Prometheus text format"""
+        stats = self.stats()
+        return (
+            "# TYPE quizbot_updates_in_flight gauge\n"
+            f"quizbot_updates_in_flight {stats['in_flight']}\n"
+            "# TYPE quizbot_updates_heavy_in_flight gauge\n"
+            f"quizbot_updates_heavy_in_flight {stats['heavy_in_flight']}\n"
+            "# TYPE quizbot_updates_queued gauge\n"
+            f"quizbot_updates_queued {stats['queued']}\n"
+            "# TYPE quizbot_updates_backlog gauge\n"
+            f"quizbot_updates_backlog {stats['backlog']}\n"
+            "# TYPE quizbot_updates_busy_keys gauge\n"
+            f"quizbot_updates_busy_keys {stats['busy_keys']}\n"
+            "# TYPE quizbot_updates_waiting_for_slot gauge\n"
+            f"quizbot_updates_waiting_for_slot {stats['waiting']}\n"
+            "# TYPE quizbot_updates_processed_total counter\n"
+            f"quizbot_updates_processed_total {self.processed}\n"
+            "# TYPE quizbot_updates_failed_total counter\n"
+            f"quizbot_updates_failed_total {self.failed}\n"
+            "# TYPE quizbot_updates_wait_seconds_sum counter\n"
+            f"quizbot_updates_wait_seconds_sum {self.wait_seconds_total:.6f}\n"
+            "# TYPE quizbot_updates_max_wait_seconds gauge\n"
+            f"quizbot_updates_max_wait_seconds {self.max_wait_seconds:.6f}\n"
+            "# TYPE quizbot_updates_max_concurrent gauge\n"
+            f"quizbot_updates_max_concurrent {self.max_concurrent_updates}\n"
+        )
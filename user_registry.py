@@ -0,0 +1,276 @@
+"""
+Persistent registry of verified and premium users
+- Backed by an indexed SQLite table, mirrored in memory for O(1) lookups
+- Supports grants with an expiry time, bulk grant/revoke and compaction
+- Behaves like a set (in, len, iteration) so existing checks keep working
+- Imports the legacy verified_users.txt / premium_users.txt files once
+"""
+
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DB_FILE = "user_registry.db"
+
+# Expired rows are deleted from disk at most this often
+COMPACT_INTERVAL_SECONDS = 6 * 60 * 60
+
+# How often to check whether another process changed the registry
+SYNC_INTERVAL_SECONDS = 2
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _get_connection(db_path):
+    """Return a shared connection for a database file, creating the schema once"""
+    with _connections_lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_registry ("
+                " kind TEXT NOT NULL,"
+                " user_id INTEGER NOT NULL,"
+                " granted_at REAL NOT NULL,"
+                " expires_at REAL,"
+                " PRIMARY KEY (kind, user_id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_registry_expiry ON user_registry (kind, expires_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS registry_meta (key TEXT PRIMARY KEY, value TEXT)")
+            _connections[db_path] = conn
+        return conn
+
+
+class UserRegistry:
+    """Set-like registry of user IDs of one kind ("verified", "premium", ...)"""
+
+    def __init__(self, kind, db_path=REGISTRY_DB_FILE, legacy_file=None):
+        self.kind = kind
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self._members = None      # user_id -> expires_at (None = never expires)
+        self._expiry_heap = []    # (expires_at, user_id), may contain stale entries
+        self._lock = threading.RLock()
+        self._last_compaction = time.time()
+        self._data_version = None
+        self._last_sync = 0.0
+
+    # ---------- loading ----------
+
+    @property
+    def _conn(self):
+        return _get_connection(self.db_path)
+
+    def _ensure_loaded(self):
+        if self._members is not None:
+            self._sync_from_disk()
+            return
+        with self._lock:
+            if self._members is not None:
+                return
+            self._migrate_legacy_file()
+            self._load_members()
+            logger.info(f"Loaded {len(self._members)} {self.kind} users from registry")
+
+    def _load_members(self):
+        """Read active members from disk and swap in a new mirror (caller holds the lock)"""
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._last_sync = time.monotonic()
+        members = {}
+        expiry_heap = []
+        now = time.time()
+        rows = self._conn.execute(
+            "SELECT user_id, expires_at FROM user_registry"
+            " WHERE kind = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self.kind, now),
+        )
+        for user_id, expires_at in rows:
+            members[user_id] = expires_at
+            if expires_at is not None:
+                expiry_heap.append((expires_at, user_id))
+        heapq.heapify(expiry_heap)
+        self._expiry_heap = expiry_heap
+        self._members = members
+
+    def _sync_from_disk(self):
+        """
+        Reload the mirror if another process committed to the database since the
+        last check (sharded workers share one registry file). PRAGMA data_version
+        only changes for commits made through other connections.
+        """
+        now = time.monotonic()
+        if now - self._last_sync < SYNC_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            self._last_sync = now
+            if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                self._load_members()
+
+    def _migrate_legacy_file(self):
+        """Import the old one-ID-per-line text file the first time the registry is used"""
+        if not self.legacy_file:
+            return
+        meta_key = f"migrated:{self.kind}"
+        if self._conn.execute("SELECT 1 FROM registry_meta WHERE key = ?", (meta_key,)).fetchone():
+            return
+        user_ids = set()
+        if os.path.exists(self.legacy_file):
+            try:
+                with open(self.legacy_file, "r") as f:
+                    user_ids = {int(line) for line in f.read().split() if line.strip().isdigit()}
+            except Exception as e:
+                logger.error(f"Error reading legacy {self.kind} users file: {e}")
+                return
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO user_registry (kind, user_id, granted_at, expires_at) VALUES (?, ?, ?, NULL)",
+                [(self.kind, user_id, now) for user_id in user_ids],
+            )
+            self._conn.execute("INSERT INTO registry_meta (key, value) VALUES (?, ?)", (meta_key, str(now)))
+        if user_ids:
+            logger.info(f"Migrated {len(user_ids)} {self.kind} users from {self.legacy_file}")
+
+    # ---------- expiry ----------
+
+    def _purge_expired(self):
+        """Drop expired members from the mirror; amortised O(log n) per expiry"""
+        now = time.time()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(heap)
+            # Skip stale heap entries left behind by re-grants or revokes
+            if self._members.get(user_id) == expires_at:
+                del self._members[user_id]
+                logger.info(f"{self.kind.capitalize()} access of user {user_id} expired")
+        if now - self._last_compaction > COMPACT_INTERVAL_SECONDS:
+            self.compact()
+
+    # ---------- set-like API ----------
+
+    def __contains__(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return False
+        self._ensure_loaded()
+        expires_at = self._members.get(user_id, 0)
+        if expires_at is None:
+            return True
+        if expires_at == 0:
+            return False
+        if expires_at <= time.time():
+            with self._lock:
+                self._purge_expired()
+            return False
+        return True
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        self._ensure_loaded()
+        with self._lock:
+            self._purge_expired()
+            return iter(list(self._members))
+
+    def add(self, user_id):
+        self.grant(user_id)
+
+    def discard(self, user_id):
+        self.revoke(user_id)
+
+    # ---------- registry API ----------
+
+    def count(self):
+        """Number of active members, without scanning the registry"""
+        self._ensure_loaded()
+        with self._lock:
+            self._purge_expired()
+            return len(self._members)
+
+    def expires_at(self, user_id):
+        """Unix timestamp when access ends, None if permanent (or not a member)"""
+        self._ensure_loaded()
+        return self._members.get(int(user_id))
+
+    def grant(self, user_id, expires_at=None):
+        """Add or extend a member; a repeat grant only updates the expiry"""
+        return self.grant_many([user_id], expires_at) == 1
+
+    def grant_many(self, user_ids, expires_at=None):
+        """Grant access to many users in one transaction; returns the number granted"""
+        self._ensure_loaded()
+        user_ids = {int(u) for u in user_ids}
+        if not user_ids:
+            return 0
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO user_registry (kind, user_id, granted_at, expires_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (kind, user_id) DO UPDATE SET expires_at = excluded.expires_at",
+                    [(self.kind, user_id, now, expires_at) for user_id in user_ids],
+                )
+            for user_id in user_ids:
+                self._members[user_id] = expires_at
+                if expires_at is not None:
+                    heapq.heappush(self._expiry_heap, (expires_at, user_id))
+        return len(user_ids)
+
+    def revoke(self, user_id):
+        """Remove a member; returns False if the user was not a member"""
+        return self.revoke_many([user_id]) == 1
+
+    def revoke_many(self, user_ids):
+        """Revoke many users in one transaction; returns the number that were members"""
+        self._ensure_loaded()
+        with self._lock:
+            present = [int(u) for u in user_ids if int(u) in self]
+            if not present:
+                return 0
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "DELETE FROM user_registry WHERE kind = ? AND user_id = ?",
+                    [(self.kind, user_id) for user_id in present],
+                )
+            for user_id in present:
+                self._members.pop(user_id, None)
+        return len(present)
+
+    def members(self):
+        """Snapshot of active members as {user_id: expires_at}"""
+        self._ensure_loaded()
+        with self._lock:
+            self._purge_expired()
+            return dict(self._members)
+
+    def compact(self):
+        """Delete expired rows from disk and rebuild the expiry heap"""
+        self._ensure_loaded()
+        with self._lock:
+            now = time.time()
+            self._last_compaction = now
+            cursor = self._conn.execute(
+                "DELETE FROM user_registry WHERE kind = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (self.kind, now),
+            )
+            self._expiry_heap = [
+                (expires_at, user_id) for user_id, expires_at in self._members.items()
+                if expires_at is not None
+            ]
+            heapq.heapify(self._expiry_heap)
+            if cursor.rowcount:
+                logger.info(f"Compacted {self.kind} registry: removed {cursor.rowcount} expired users")
+            return cursor.rowcount
@@ -0,0 +1,215 @@
+"""
+In-process webhook server for the Telegram Quiz Bot
+- One asyncio HTTP/1.1 server in the bot process, no Flask or extra processes
+- POST <webhook path>: Telegram updates, verified with the secret token header
+  and handed straight to the Application's update queue
+- GET /health and GET /metrics for the platform's checks and scraping
+- Keep-alive connections, bounded concurrent connections and request size
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+# Telegram sends at most max_connections parallel requests; keep headroom for health checks
+DEFAULT_MAX_CONNECTIONS = 40
+EXTRA_CONNECTIONS = 8
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+IDLE_TIMEOUT_SECONDS = 75
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(REASONS.get(status, str(status)))
+        self.status = status
+
+
+class WebhookServer:
+    """
+    Serves Telegram webhook updates plus health and metrics routes.
+    submit_update(data) receives each verified update payload (a dict), or is
+    None to serve only the GET routes;
+    extra GET routes map a path to a callable returning (status, content_type, body).
+    """
+
+    def __init__(self, submit_update, webhook_path, secret_token, host="0.0.0.0", port=8080,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, routes=None):
+        self.submit_update = submit_update
+        self.webhook_path = "/" + webhook_path.lstrip("/")
+        self.secret_token = secret_token or ""
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.routes = dict(routes or {})
+        self.routes.setdefault("/health", self._health)
+        self._slots = asyncio.Semaphore(max_connections + EXTRA_CONNECTIONS)
+        self._server = None
+        self.started_at = None
+        self.updates_received = 0
+        self.updates_rejected = 0
+        self.requests_served = 0
+        self.open_connections = 0
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.started_at = time.time()
+        bound = ", ".join(str(sock.getsockname()) for sock in self._server.sockets)
+        logger.info(f"Webhook server listening on {bound}, updates at {self.webhook_path}")
+
+    @property
+    def bound_port(self):
+        """The listening port (useful when started with port 0)"""
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # ---------- routes ----------
+
+    def _health(self):
+        return 200, "application/json", json.dumps({
+            "status": "healthy",
+            "mode": "webhook",
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0,
+        })
+
+    def metrics_text(self):
+        """Webhook counters in Prometheus text format"""
+        return (
+            "# TYPE quizbot_webhook_updates_total counter\n"
+            f"quizbot_webhook_updates_total {self.updates_received}\n"
+            "# TYPE quizbot_webhook_rejected_total counter\n"
+            f"quizbot_webhook_rejected_total {self.updates_rejected}\n"
+            "# TYPE quizbot_webhook_open_connections gauge\n"
+            f"quizbot_webhook_open_connections {self.open_connections}\n"
+        )
+
+    async def _dispatch(self, method, path, headers, body):
+        path = path.split("?", 1)[0]
+        if path == self.webhook_path and self.submit_update is not None:
+            if method != "POST":
+                raise HttpError(405)
+            if self.secret_token and not hmac.compare_digest(
+                    headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()):
+                self.updates_rejected += 1
+                raise HttpError(401)
+            try:
+                data = json.loads(body)
+            except ValueError:
+                self.updates_rejected += 1
+                raise HttpError(400)
+            if not isinstance(data, dict):
+                self.updates_rejected += 1
+                raise HttpError(400)
+            await self.submit_update(data)
+            self.updates_received += 1
+            return 200, "application/json", "{}"
+
+        route = self.routes.get(path)
+        if route is None:
+            raise HttpError(404)
+        if method not in ("GET", "HEAD"):
+            raise HttpError(405)
+        result = route()
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    # ---------- HTTP/1.1 ----------
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT_SECONDS)
+        if len(head) > MAX_HEADER_BYTES:
+            raise HttpError(400)
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HttpError(400)
+        if length < 0:
+            raise HttpError(400)
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413)
+        # A client that stalls after its headers must not hold the connection slot forever
+        body = await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT_SECONDS) if length else b""
+        return method.upper(), path, version, headers, body
+
+    @staticmethod
+    def _write_response(writer, status, content_type, body, keep_alive):
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+        )
+
+    async def _handle_connection(self, reader, writer):
+        async with self._slots:
+            self.open_connections += 1
+            try:
+                while True:
+                    try:
+                        method, path, version, headers, body = await self._read_request(reader)
+                    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError,
+                            asyncio.LimitOverrunError):
+                        break
+                    except HttpError as e:
+                        self._write_response(writer, e.status, "text/plain", str(e), False)
+                        break
+
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  and version.upper() != "HTTP/1.0")
+                    try:
+                        status, content_type, response_body = await self._dispatch(method, path, headers, body)
+                    except HttpError as e:
+                        status, content_type, response_body = e.status, "text/plain", str(e)
+                    except Exception as e:
+                        logger.error(f"Error handling {method} {path}: {e}", exc_info=True)
+                        status, content_type, response_body = 500, "text/plain", "Internal Server Error"
+                    if method == "HEAD":
+                        response_body = ""
+                    self.requests_served += 1
+                    self._write_response(writer, status, content_type, response_body, keep_alive)
+                    try:
+                        await writer.drain()
+                    except ConnectionError:
+                        # The client hung up before reading the response
+                        break
+                    if not keep_alive:
+                        break
+            finally:
+                self.open_connections -= 1
+                try:
+                    writer.close()
+                    await writer.wait_closed()
+                except Exception:
+                    pass